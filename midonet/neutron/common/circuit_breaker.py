@@ -0,0 +1,114 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import time
+
+from midonetclient import exc
+from webob import exc as w_exc
+
+from neutron.common import exceptions as n_exc
+from neutron import i18n
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+_LI = i18n._LI
+_LW = i18n._LW
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitOpen(n_exc.ServiceUnavailable):
+    message = _("The MidoNet API is unavailable, retry later")
+
+
+def is_api_failure(ex):
+    """Return True if ex shows that the MidoNet API is unavailable.
+
+    Connection errors and server errors count as failures.  Other errors,
+    such as a rejected request, show that the API is responding.
+    """
+    return isinstance(ex, (exc.MidoApiConnectionError, socket.error,
+                           w_exc.HTTPServerError))
+
+
+class CircuitBreaker(object):
+    """Fail fast while the MidoNet API is unavailable.
+
+    The circuit is CLOSED as long as calls succeed.  After
+    'failure_threshold' consecutive failures, it opens and calls fail right
+    away with CircuitOpen instead of waiting for the API to time out.  Once
+    'reset_timeout' seconds have passed, the circuit is HALF_OPEN: a single
+    probe call is let through, and closes the circuit if it succeeds or
+    opens it again if it fails.  A 'failure_threshold' of 0 disables the
+    circuit breaker.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout,
+                 is_failure=is_api_failure):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._is_failure = is_failure
+        self._state = CLOSED
+        self._opened_at = None
+        self._probing = False
+        self.failure_count = 0
+
+    @property
+    def state(self):
+        if (self._state == OPEN and
+                time.time() - self._opened_at >= self._reset_timeout):
+            return HALF_OPEN
+        return self._state
+
+    def call(self, func, *args, **kwargs):
+        if self._failure_threshold <= 0:
+            return func(*args, **kwargs)
+
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing):
+            raise CircuitOpen()
+        self._probing = state == HALF_OPEN
+        try:
+            result = func(*args, **kwargs)
+        except Exception as ex:
+            if self._is_failure(ex):
+                self._record_failure(state)
+            else:
+                self._record_success(state)
+            raise
+        finally:
+            if state == HALF_OPEN:
+                self._probing = False
+        self._record_success(state)
+        return result
+
+    def _record_failure(self, state):
+        self.failure_count += 1
+        if state == HALF_OPEN or self.failure_count >= self._failure_threshold:
+            if self._state != OPEN:
+                LOG.warn(_LW("MidoNet API circuit opened after %d "
+                             "failures"), self.failure_count)
+            self._state = OPEN
+            self._opened_at = time.time()
+
+    def _record_success(self, state):
+        if state == HALF_OPEN:
+            LOG.info(_LI("MidoNet API circuit closed"))
+        self._state = CLOSED
+        self.failure_count = 0
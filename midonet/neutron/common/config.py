@@ -0,0 +1,88 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+API_DISPATCH_SYNC = 'sync'
+API_DISPATCH_ASYNC = 'async'
+API_DISPATCH_JOURNAL = 'journal'
+
+TASK_UPDATE_FULL = 'full'
+TASK_UPDATE_DELTA = 'delta'
+
+midonet_opts = [
+    cfg.StrOpt('api_dispatch_mode', default=API_DISPATCH_SYNC,
+               choices=[API_DISPATCH_SYNC, API_DISPATCH_ASYNC,
+                        API_DISPATCH_JOURNAL],
+               help=_("How MidoNet API calls are made for Neutron write "
+                      "operations. 'sync' calls the API inside the request. "
+                      "'async' calls it on a worker pool after the Neutron "
+                      "transaction has been committed. 'journal' never "
+                      "calls the API and leaves the propagation to the "
+                      "MidoNet cluster consuming the task journal; router "
+                      "interfaces and pool health monitor associations are "
+                      "then journaled as well, with the ROUTERINTERFACE and "
+                      "POOLHEALTHMONITOR task data types.")),
+    cfg.IntOpt('api_worker_pool_size', default=8,
+               help=_("Number of green threads used to call the MidoNet API "
+                      "in the 'async' dispatch mode.")),
+    cfg.BoolOpt('task_data_compression', default=False,
+                help=_("Compress the resource data written to the task "
+                       "journal.  The MidoNet cluster consuming the journal "
+                       "must support compressed task data.")),
+    cfg.StrOpt('task_update_encoding', default=TASK_UPDATE_FULL,
+               choices=[TASK_UPDATE_FULL, TASK_UPDATE_DELTA],
+               help=_("How UPDATE tasks are written to the task journal. "
+                      "'full' writes the whole resource. 'delta' writes "
+                      "only the fields changed since the previous task of "
+                      "the resource. The MidoNet cluster consuming the "
+                      "journal must support delta encoded tasks.")),
+    cfg.IntOpt('task_full_update_interval', default=10,
+               help=_("With the 'delta' task update encoding, write the "
+                      "whole resource in every Nth UPDATE task of a "
+                      "resource, which bounds the number of deltas to apply "
+                      "to rebuild its state.")),
+    cfg.StrOpt('lock_driver',
+               default='midonet.neutron.common.lock.FileLockDriver',
+               help=_("Driver of the locks serializing the port and network "
+                      "operations of the plugin. "
+                      "'midonet.neutron.common.lock.FileLockDriver' only "
+                      "serializes the workers of one host. "
+                      "'midonet.neutron.common.lock.DbLockDriver' uses "
+                      "advisory locks of the Neutron database, which are "
+                      "shared by all the neutron-server nodes.")),
+    cfg.IntOpt('lock_timeout', default=30,
+               help=_("Number of seconds to wait for a database advisory "
+                      "lock before failing the request.")),
+    cfg.BoolOpt('api_connection_pooling', default=False,
+                help=_("Keep the connections to the MidoNet API alive and "
+                       "share them between the requests of a worker.")),
+    cfg.IntOpt('api_connection_pool_size', default=10,
+               help=_("Maximum number of pooled MidoNet API connections per "
+                      "worker when api_connection_pooling is enabled.")),
+    cfg.IntOpt('api_connection_idle_timeout', default=60,
+               help=_("Number of seconds after which an idle pooled MidoNet "
+                      "API connection is reopened before its next use.")),
+    cfg.IntOpt('api_failure_threshold', default=5,
+               help=_("Number of consecutive MidoNet API connection or "
+                      "server errors after which API calls fail right away "
+                      "instead of waiting for the API. 0 disables it.")),
+    cfg.IntOpt('api_reset_timeout', default=30,
+               help=_("Number of seconds after which a single MidoNet API "
+                      "call is let through to check whether the API is "
+                      "available again.")),
+]
+
+cfg.CONF.register_opts(midonet_opts, "MIDONET")
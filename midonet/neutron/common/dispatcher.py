@@ -0,0 +1,114 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from eventlet import event as green_event
+from sqlalchemy import event
+from sqlalchemy import orm
+
+from neutron import i18n
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+_LE = i18n._LE
+
+_PENDING_CALLS = 'midonet_pending_api_calls'
+
+
+class ApiDispatcher(object):
+    """Run MidoNet API calls on a bounded pool of green threads.
+
+    Each call is submitted with a key, or a tuple of keys, naming the
+    resources it depends on.  A call is run once all the calls previously
+    submitted with any of its keys are done, so that calls on the same
+    resource run one at a time in the order they were submitted, and a call
+    on a resource that depends on another one runs after the calls on that
+    other resource.  Calls without keys in common run concurrently, up to the
+    size of the pool.  When the pool is full, 'submit' blocks until a green
+    thread is available.
+    """
+
+    def __init__(self, pool_size):
+        self._pool = eventlet.GreenPool(pool_size)
+        # Completion event of the last call submitted with each key
+        self._tails = {}
+
+    def submit(self, key, func, args=(), on_error=None):
+        keys = tuple(k for k in (key if isinstance(key, tuple) else (key,))
+                     if k is not None)
+        preceding = set(self._tails[k] for k in keys if k in self._tails)
+        done = green_event.Event()
+        for k in keys:
+            self._tails[k] = done
+        # The preceding calls were spawned earlier, so they hold or have
+        # released their green threads and never wait for this call.
+        self._pool.spawn_n(self._run, keys, preceding, done, func, args,
+                           on_error)
+
+    def submit_after_commit(self, session, key, func, args=(), on_error=None):
+        """Submit the call once the current transaction of session commits.
+
+        If there is no transaction in progress, the call is submitted
+        immediately.  The call is discarded if the transaction is rolled
+        back.
+        """
+        if session.transaction is None:
+            self.submit(key, func, args, on_error)
+            return
+        pending = session.info.setdefault(_PENDING_CALLS, [])
+        pending.append((self, key, func, args, on_error))
+
+    def _run(self, keys, preceding, done, func, args, on_error):
+        try:
+            for ev in preceding:
+                ev.wait()
+            try:
+                func(*args)
+            except Exception as ex:
+                LOG.error(_LE("MidoNet API call %(func)s failed for "
+                              "%(keys)s: %(err)s"),
+                          {'func': getattr(func, '__name__', func),
+                           'keys': keys, 'err': ex})
+                if on_error is not None:
+                    self._run_error_callback(on_error, ex)
+        finally:
+            done.send()
+            for k in keys:
+                if self._tails.get(k) is done:
+                    del self._tails[k]
+
+    @staticmethod
+    def _run_error_callback(on_error, ex):
+        try:
+            on_error(ex)
+        except Exception:
+            LOG.exception(_LE("Failure callback of a MidoNet API call "
+                              "failed"))
+
+    def waitall(self):
+        self._pool.waitall()
+
+
+@event.listens_for(orm.Session, 'after_commit')
+def _submit_pending_calls(session):
+    for dispatcher, key, func, args, on_error in session.info.pop(
+            _PENDING_CALLS, []):
+        dispatcher.submit(key, func, args, on_error)
+
+
+@event.listens_for(orm.Session, 'after_rollback')
+def _discard_pending_calls(session):
+    session.info.pop(_PENDING_CALLS, None)
@@ -0,0 +1,128 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import time
+
+from eventlet import pools
+import httplib2
+from oslo_utils import excutils
+
+from neutron import i18n
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+_LI = i18n._LI
+_LW = i18n._LW
+
+
+def _close_connections(http):
+    for conn in http.connections.values():
+        conn.close()
+    http.connections.clear()
+
+
+class HttpPool(pools.Pool):
+    """Pool of keep-alive httplib2.Http objects shared by green threads.
+
+    Each Http object keeps its connections open between requests.  A
+    connection left idle for longer than 'idle_timeout' seconds may have
+    been closed by the server, so it is closed and reopened before the
+    next request.  The connections of an Http object whose request failed
+    are closed as well.
+    """
+
+    def __init__(self, max_size, idle_timeout):
+        super(HttpPool, self).__init__(max_size=max_size)
+        self._idle_timeout = idle_timeout
+        self._last_used = {}
+
+    def create(self):
+        return httplib2.Http()
+
+    @contextlib.contextmanager
+    def http(self):
+        http = self.get()
+        last_used = self._last_used.get(id(http))
+        if (last_used is not None and
+                time.time() - last_used > self._idle_timeout):
+            _close_connections(http)
+        try:
+            yield http
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                _close_connections(http)
+        finally:
+            self._last_used[id(http)] = time.time()
+            self.put(http)
+
+
+class PooledHttp(object):
+    """httplib2.Http stand-in running its requests on a pooled Http."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def request(self, *args, **kwargs):
+        with self._pool.http() as http:
+            return http.request(*args, **kwargs)
+
+
+class PooledHttplib2(object):
+    """httplib2 module stand-in whose Http objects use an HttpPool.
+
+    Http objects created with arguments are not pooled, since their
+    settings would be shared with the other users of the pool.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def Http(self, *args, **kwargs):
+        if args or kwargs:
+            return httplib2.Http(*args, **kwargs)
+        return PooledHttp(self._pool)
+
+    def __getattr__(self, name):
+        return getattr(httplib2, name)
+
+
+def install(pool_size, idle_timeout):
+    """Make the MidoNet API client send its requests through an HttpPool.
+
+    The client creates an httplib2.Http object for each request, which
+    opens a new connection every time.  Its httplib2 module is replaced
+    with a PooledHttplib2, so that connections are kept alive and reused
+    across requests and green threads.
+
+    :returns: True if the pool was installed
+    """
+    try:
+        from midonetclient import api_lib
+    except ImportError:
+        api_lib = None
+    if isinstance(getattr(api_lib, 'httplib2', None), PooledHttplib2):
+        return True
+    if getattr(api_lib, 'httplib2', None) is not httplib2:
+        LOG.warn(_LW("The MidoNet API client does not use httplib2, not "
+                     "pooling its connections"))
+        return False
+
+    api_lib.httplib2 = PooledHttplib2(HttpPool(pool_size, idle_timeout))
+    LOG.info(_LI("Pooling MidoNet API connections: pool_size=%(size)d, "
+                 "idle_timeout=%(timeout)d"),
+             {'size': pool_size, 'timeout': idle_timeout})
+    return True
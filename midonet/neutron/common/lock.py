@@ -0,0 +1,197 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import abc
+import contextlib
+import hashlib
+import struct
+import time
+
+from oslo_concurrency import lockutils
+from oslo_config import cfg
+from oslo_utils import importutils
+import six
+import sqlalchemy as sa
+
+from midonet.neutron.common import config  # noqa
+from neutron.common import exceptions as n_exc
+from neutron.db import api as db_api
+from neutron import i18n
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+_LW = i18n._LW
+
+# Interval in seconds between attempts to take a PostgreSQL advisory lock
+PG_LOCK_POLL_INTERVAL = 0.1
+
+# Longest lock name accepted by the MySQL GET_LOCK function
+MYSQL_LOCK_NAME_LENGTH = 64
+
+# First MySQL version able to hold several GET_LOCK locks per connection
+MYSQL_MULTIPLE_LOCKS_VERSION = (5, 7, 5)
+
+
+class LockTimeout(n_exc.Conflict):
+    message = _("Timed out waiting for the lock %(name)s")
+
+
+@six.add_metaclass(abc.ABCMeta)
+class LockDriver(object):
+    """Base class of the drivers of the plugin critical section locks."""
+
+    @abc.abstractmethod
+    def lock(self, name):
+        """Return a context manager holding the lock 'name'."""
+
+    @contextlib.contextmanager
+    def lock_all(self, names):
+        """Hold the locks of all the names, taken in sorted order."""
+        names = sorted(set(names))
+        if not names:
+            yield
+            return
+        with self.lock(names[0]):
+            with self.lock_all(names[1:]):
+                yield
+
+
+class FileLockDriver(LockDriver):
+    """Lock with external file locks, which only serialize one host."""
+
+    def lock(self, name):
+        return lockutils.lock(name, lock_file_prefix='neutron-',
+                              external=True)
+
+
+class DbLockDriver(LockDriver):
+    """Lock with advisory locks of the Neutron database.
+
+    The locks are shared by all the neutron-server nodes using the database.
+    They are held on a connection of their own, so that they do not depend
+    on the transactions of the request.  All the locks taken by one lock_all
+    call share the connection, so that a batch does not exhaust the pool,
+    except on MySQL before 5.7.5, where a connection holds at most one lock.
+    MySQL and PostgreSQL are supported.  For other databases, external file
+    locks are used instead.
+    """
+
+    def __init__(self):
+        self._timeout = cfg.CONF.MIDONET.lock_timeout
+        self._fallback = None
+
+    def lock(self, name):
+        return self.lock_all([name])
+
+    @contextlib.contextmanager
+    def lock_all(self, names):
+        names = sorted(set(names))
+        engine = db_api.get_engine()
+        dialect = engine.dialect.name
+        if dialect == 'mysql':
+            acquire, release = self._mysql_lock, self._mysql_unlock
+        elif dialect == 'postgresql':
+            acquire, release = self._pg_lock, self._pg_unlock
+        else:
+            if self._fallback is None:
+                LOG.warn(_LW("Database advisory locks are not supported by "
+                             "%s, using file locks instead"), dialect)
+                self._fallback = FileLockDriver()
+            with self._fallback.lock_all(names):
+                yield
+            return
+
+        conns = [engine.connect()]
+        held = []
+        try:
+            for name in names:
+                conn = conns[-1]
+                if held and not self._holds_multiple_locks(conn):
+                    conn = engine.connect()
+                    conns.append(conn)
+                acquire(conn, name)
+                held.append((conn, name))
+            yield
+        finally:
+            try:
+                for conn, name in reversed(held):
+                    release(conn, name)
+            finally:
+                for conn in conns:
+                    conn.close()
+
+    @staticmethod
+    def _holds_multiple_locks(conn):
+        # Before MySQL 5.7.5, GET_LOCK releases the lock already held.
+        return (conn.dialect.name != 'mysql' or
+                conn.dialect.server_version_info >=
+                MYSQL_MULTIPLE_LOCKS_VERSION)
+
+    @staticmethod
+    def _mysql_name(name):
+        if len(name) > MYSQL_LOCK_NAME_LENGTH:
+            name = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return name
+
+    def _mysql_lock(self, conn, name):
+        # GET_LOCK returns 1 once the lock is held and 0 on timeout.
+        got = conn.execute(sa.text("SELECT GET_LOCK(:name, :timeout)"),
+                           name=self._mysql_name(name),
+                           timeout=self._timeout).scalar()
+        if got != 1:
+            raise LockTimeout(name=name)
+
+    def _mysql_unlock(self, conn, name):
+        conn.execute(sa.text("SELECT RELEASE_LOCK(:name)"),
+                     name=self._mysql_name(name))
+
+    @staticmethod
+    def _pg_key(name):
+        # PostgreSQL advisory locks are identified by a signed 64 bit key.
+        digest = hashlib.sha1(name.encode('utf-8')).digest()
+        return struct.unpack('>q', digest[:8])[0]
+
+    def _pg_lock(self, conn, name):
+        deadline = time.time() + self._timeout
+        while not conn.execute(sa.text("SELECT pg_try_advisory_lock(:key)"),
+                               key=self._pg_key(name)).scalar():
+            if time.time() >= deadline:
+                raise LockTimeout(name=name)
+            time.sleep(PG_LOCK_POLL_INTERVAL)
+
+    def _pg_unlock(self, conn, name):
+        conn.execute(sa.text("SELECT pg_advisory_unlock(:key)"),
+                     key=self._pg_key(name))
+
+
+def lock_all(names):
+    """Hold the locks of all the names with the configured lock driver.
+
+    The locks are taken in sorted order, so that callers locking
+    overlapping sets of names cannot deadlock each other.
+    """
+    return get_driver().lock_all(names)
+
+
+_driver = None
+
+
+def get_driver():
+    """Return the lock driver configured with the lock_driver option."""
+    global _driver
+    if _driver is None:
+        _driver = importutils.import_object(cfg.CONF.MIDONET.lock_driver)
+    return _driver
@@ -14,11 +14,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import functools
+import random
 import re
 import time
 from webob import exc as w_exc
 
 from midonetclient import exc
+from oslo_db import exception as db_exc
+import six
+
+from midonet.neutron.common import lock
 
 from neutron.api.v2 import base
 from neutron.common import exceptions as n_exc
@@ -30,6 +37,15 @@ LOG = logging.getLogger(__name__)
 PLURAL_NAME_MAP = {}
 _LW = i18n._LW
 
+# Messages of the database errors raised when a lock wait times out
+LOCK_WAIT_TIMEOUT_MESSAGES = ('Lock wait timeout exceeded',
+                              'canceling statement due to lock timeout')
+
+# Number of retries and of given up calls of 'retry_on_db_conflict', by
+# function name
+RETRY_COUNTS = collections.Counter()
+GIVE_UP_COUNTS = collections.Counter()
+
 
 def handle_api_error(fn):
     """Wrapper for methods that throws custom exceptions."""
@@ -70,6 +86,87 @@ def retry_on_error(attempts, delay, error_cls):
     return internal_wrapper
 
 
+def is_db_conflict(ex):
+    """Return True if ex is a deadlock or a lock wait timeout DB error."""
+    if isinstance(ex, db_exc.DBDeadlock):
+        return True
+    if not isinstance(ex, db_exc.DBError):
+        return False
+    msg = six.text_type(ex.inner_exception or ex)
+    return any(m in msg for m in LOCK_WAIT_TIMEOUT_MESSAGES)
+
+
+def retry_on_db_conflict(max_retries=3, initial_delay=0.05, max_delay=1.0,
+                         budget=2.0):
+    """Decorator retrying the function on transient DB conflicts.
+
+    Only deadlocks and lock wait timeouts are retried; other errors are
+    raised right away.  The delay before each retry grows exponentially from
+    'initial_delay' up to 'max_delay', and a random delay up to that value is
+    used so that conflicting requests do not retry in lockstep.  The retries
+    of a call stop when 'max_retries' is reached or when the next delay would
+    exceed the 'budget' of seconds spent in the call, and the last error is
+    raised.  Retries and given up calls are counted in RETRY_COUNTS and
+    GIVE_UP_COUNTS.
+
+    :param max_retries: Maximum number of retries of a call
+    :param initial_delay: Upper bound in seconds of the first delay
+    :param max_delay: Upper bound in seconds of any delay
+    :param budget: Maximum number of seconds spent in a call before the
+                   retries stop
+    """
+    def internal_wrapper(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def retry(*args, **kwargs):
+            start = time.time()
+            for attempt in range(max_retries + 1):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as ex:
+                    if not is_db_conflict(ex):
+                        raise
+                    delay = random.uniform(
+                        0, min(max_delay, initial_delay * 2 ** attempt))
+                    elapsed = time.time() - start
+                    if attempt == max_retries or elapsed + delay > budget:
+                        GIVE_UP_COUNTS[name] += 1
+                        LOG.warn(_LW('Giving up %(func)s after %(num)d '
+                                     'retries: %(err)r'),
+                                 {'func': name, 'num': attempt, 'err': ex})
+                        raise
+                    RETRY_COUNTS[name] += 1
+                    LOG.warn(_LW('Retrying %(func)s in %(delay).3fs because '
+                                 'of error: %(err)r'),
+                             {'func': name, 'delay': delay, 'err': ex})
+                    time.sleep(delay)
+        return retry
+    return internal_wrapper
+
+
+def synchronized_on(name, key_func):
+    """Decorator that serializes calls per key.
+
+    Unlike neutron.common.utils.synchronized, which takes a single lock for
+    all the calls, the lock is named after the key returned by
+    'key_func(*args, **kwargs)', so that calls with different keys do not
+    wait for each other.  The lock is taken with the configured lock driver.
+
+    :param name: Prefix of the lock name
+    :param key_func: Function returning the key of the call, given the
+                     arguments of the decorated function
+    """
+    def internal_wrapper(func):
+        @functools.wraps(func)
+        def synchronized(*args, **kwargs):
+            lock_name = '%s-%s' % (name, key_func(*args, **kwargs))
+            with lock.get_driver().lock(lock_name):
+                return func(*args, **kwargs)
+        return synchronized
+    return internal_wrapper
+
+
 class MidonetApiException(n_exc.NeutronException):
         message = _("MidoNet API error: %(msg)s")
 
@@ -12,13 +12,77 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import functools
+
 from neutron.common import constants as n_const
+from neutron.db import external_net_db
 from neutron.db import l3_db
 from neutron.db import models_v2
 from neutron_lbaas.db.loadbalancer import loadbalancer_db as lb_db
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
 from sqlalchemy.orm import exc
 
+_LOOKUP_CACHE = 'midonet_lookup_cache'
+_PENDING_CACHE_UPDATES = 'midonet_pending_cache_updates'
+
+
+def cached_lookup(func):
+    """Decorator caching the results of a lookup in the request session.
+
+    The results of 'func(context, *args)' are kept in the info of the session
+    of the context, which lives as long as the request, and are discarded
+    as soon as the session flushes, commits or rolls back, so that writes
+    made in the session are never hidden by the cache.  The arguments must
+    be hashable.
+    """
+    @functools.wraps(func)
+    def wrapper(context, *args):
+        key = (func.__name__,) + args
+        cache = context.session.info.get(_LOOKUP_CACHE, {})
+        if key in cache:
+            return cache[key]
+        result = func(context, *args)
+        # The lookup may have autoflushed the session, which resets the cache.
+        context.session.info.setdefault(_LOOKUP_CACHE, {})[key] = result
+        return result
+    return wrapper
+
+
+@event.listens_for(orm.Session, 'after_flush')
+@event.listens_for(orm.Session, 'after_commit')
+@event.listens_for(orm.Session, 'after_rollback')
+def _clear_lookup_cache(session, *args):
+    session.info.pop(_LOOKUP_CACHE, None)
+
+
+def cache_after_commit(session, cache, key, value):
+    """Store a value in a cache once the transaction of session commits.
 
+    The value is stored right away if there is no transaction in progress,
+    and dropped if the transaction is rolled back, so that the cache never
+    holds data that was not committed.
+    """
+    if session.transaction is None:
+        cache[key] = value
+        return
+    session.info.setdefault(_PENDING_CACHE_UPDATES, []).append(
+        (cache, key, value))
+
+
+@event.listens_for(orm.Session, 'after_commit')
+def _apply_pending_cache_updates(session):
+    for cache, key, value in session.info.pop(_PENDING_CACHE_UPDATES, []):
+        cache[key] = value
+
+
+@event.listens_for(orm.Session, 'after_rollback')
+def _drop_pending_cache_updates(session):
+    session.info.pop(_PENDING_CACHE_UPDATES, None)
+
+
+@cached_lookup
 def get_by_model_id(context, model, object_id):
     objects = context.session.query(model)
     objects = objects.filter(model.id == object_id)
@@ -28,6 +92,20 @@ def get_by_model_id(context, model, object_id):
         return None
 
 
+def get_session_object(context, model, object_id):
+    """Return the object of the session with the ID, without flushing.
+
+    Objects added to the session but not flushed yet are returned as well,
+    so that changing them alters the pending INSERT instead of issuing an
+    UPDATE.  Flushed objects are taken from the identity map of the
+    session, and only queried if they are not there.
+    """
+    for obj in context.session.new:
+        if isinstance(obj, model) and obj.id == object_id:
+            return obj
+    return context.session.query(model).get(object_id)
+
+
 def get_network(context, network_id):
     return get_by_model_id(context, models_v2.Network, network_id)
 
@@ -46,46 +124,64 @@ def is_subnet_external(context, subnet):
     return network.external
 
 
-def get_router_from_subnet(context, subnet):
-    iport = get_router_interface_port(context, subnet)
-    if iport is None:
+def _subnet_router_query(context, *entities):
+    """Query entities joined with the subnets and their interface routers.
+
+    The router interface of a subnet is the router port holding the gateway
+    IP of the subnet, looked up through the indexed IP allocations of the
+    subnet and the router ports.  Subnets without a router interface have a
+    NULL router.
+    """
+    query = context.session.query(*entities).select_from(models_v2.Subnet)
+    query = query.outerjoin(
+        models_v2.IPAllocation,
+        sa.and_(models_v2.IPAllocation.subnet_id == models_v2.Subnet.id,
+                models_v2.IPAllocation.ip_address ==
+                models_v2.Subnet.gateway_ip))
+    return query.outerjoin(
+        l3_db.RouterPort,
+        sa.and_(l3_db.RouterPort.port_id == models_v2.IPAllocation.port_id,
+                l3_db.RouterPort.port_type ==
+                n_const.DEVICE_OWNER_ROUTER_INTF))
+
+
+@cached_lookup
+def get_subnet_router(context, subnet_id):
+    """Return whether the subnet is external and its router in one query.
+
+    :returns: (external, router_id) tuple, where router_id is None if the
+              subnet has no router interface, or None if there is no such
+              subnet
+    """
+    query = _subnet_router_query(context,
+                                 external_net_db.ExternalNetwork.network_id,
+                                 l3_db.RouterPort.router_id)
+    query = query.outerjoin(
+        external_net_db.ExternalNetwork,
+        external_net_db.ExternalNetwork.network_id ==
+        models_v2.Subnet.network_id)
+    row = query.filter(models_v2.Subnet.id == subnet_id).first()
+    if row is None:
         return None
-    else:
-        return get_router_from_port(context, iport)
+    return row[0] is not None, row[1]
 
 
-def get_router_from_pool(context, pool_id):
-    pool = get_pool(context, pool_id)
-    if pool is None:
-        return None
+def get_router_from_subnet(context, subnet):
+    row = get_subnet_router(context, subnet['id'])
+    return None if row is None else row[1]
 
-    subnet = get_subnet(context, pool.subnet_id)
-    if subnet is None:
-        return None
 
-    return get_router_from_subnet(context, subnet)
+@cached_lookup
+def get_pool_router(context, pool_id):
+    """Return the router of the subnet of the pool in one query."""
+    query = _subnet_router_query(context, l3_db.Router)
+    query = query.join(lb_db.Pool,
+                       lb_db.Pool.subnet_id == models_v2.Subnet.id)
+    query = query.join(l3_db.Router,
+                       l3_db.Router.id == l3_db.RouterPort.router_id)
+    return query.filter(lb_db.Pool.id == pool_id).first()
 
 
-def get_router_from_port(context, port_id):
-    routers = context.session.query(l3_db.Router)
-    routers = routers.join(models_v2.Port,
-                           l3_db.Router.id == models_v2.Port.device_id)
-    routers = routers.filter(models_v2.Port.id == port_id)
-    try:
-        return routers.one().id
-    except exc.NoResultFound:
-        return None
-
-
-def get_router_interface_port(context, subnet):
-    all_ports = context.session.query(models_v2.Port).join(
-        models_v2.Port.fixed_ips)
-    ports = all_ports.filter(
-        models_v2.Port.device_owner == n_const.DEVICE_OWNER_ROUTER_INTF)
-    ports = ports.filter(models_v2.Port.network_id == subnet['network_id'])
-    ports = ports.filter(
-        models_v2.IPAllocation.ip_address == subnet['gateway_ip'])
-    try:
-        return ports.one().id
-    except exc.NoResultFound:
-        return None
+def get_router_from_pool(context, pool_id):
+    router = get_pool_router(context, pool_id)
+    return None if router is None else router.id
@@ -0,0 +1,51 @@
+# Copyright 2015 Midokura SARL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""convert task data to binary
+
+Revision ID: 2f6c3d9e1a87
+Revises: 94509c777ded
+Create Date: 2015-03-17 14:02:48.730113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2f6c3d9e1a87'
+down_revision = '94509c777ded'
+
+from alembic import op
+import sqlalchemy as sa
+
+TASK_TABLE_NAME = 'midonet_tasks'
+DATA_COL_NAME = 'data'
+
+
+def upgrade():
+    # The existing JSON text is kept as is; readers tell it apart from the
+    # compressed data by its prefix.  PostgreSQL has no implicit cast from
+    # text to bytea, so the text is converted to its UTF-8 encoding.
+    op.alter_column(TASK_TABLE_NAME, DATA_COL_NAME,
+                    type_=sa.LargeBinary(length=2 ** 24),
+                    existing_type=sa.Text(length=2 ** 24),
+                    postgresql_using="convert_to(%s, 'UTF8')" % DATA_COL_NAME)
+
+
+def downgrade():
+    # Compressed task data cannot be read as text.  Disable the
+    # task_data_compression option and flush the tasks before downgrading.
+    op.alter_column(TASK_TABLE_NAME, DATA_COL_NAME,
+                    type_=sa.Text(length=2 ** 24),
+                    existing_type=sa.LargeBinary(length=2 ** 24),
+                    postgresql_using="convert_from(%s, 'UTF8')" %
+                    DATA_COL_NAME)
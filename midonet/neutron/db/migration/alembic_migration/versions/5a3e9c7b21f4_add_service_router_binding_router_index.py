@@ -0,0 +1,46 @@
+# Copyright 2015 Midokura SARL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""add service router binding router index
+
+Revision ID: 5a3e9c7b21f4
+Revises: 2f6c3d9e1a87
+Create Date: 2015-03-17 14:05:48.092310
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5a3e9c7b21f4'
+down_revision = '2f6c3d9e1a87'
+
+from alembic import op
+
+TABLE_NAME = 'midonet_servicerouterbindings'
+INDEX_NAME = 'ix_midonet_servicerouterbindings_router_id'
+
+
+def _needs_index():
+    # On MySQL, the foreign key of router_id already created an index
+    # on it, which the foreign key would keep the downgrade from dropping.
+    return op.get_bind().dialect.name != 'mysql'
+
+
+def upgrade():
+    if _needs_index():
+        op.create_index(INDEX_NAME, TABLE_NAME, ['router_id'])
+
+
+def downgrade():
+    if _needs_index():
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
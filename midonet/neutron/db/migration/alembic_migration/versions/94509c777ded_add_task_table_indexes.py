@@ -0,0 +1,45 @@
+# Copyright 2015 Midokura SARL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""add task table indexes
+
+Revision ID: 94509c777ded
+Revises: 1dc335c43b23
+Create Date: 2015-03-10 09:12:31.518224
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '94509c777ded'
+down_revision = '1dc335c43b23'
+
+from alembic import op
+
+TASK_TABLE_NAME = 'midonet_tasks'
+INDEXED_COLUMNS = ['resource_id', 'data_type', 'tenant_id',
+                   'transaction_id', 'created_at']
+
+
+def _index_name(column):
+    return 'ix_%s_%s' % (TASK_TABLE_NAME, column)
+
+
+def upgrade():
+    for column in INDEXED_COLUMNS:
+        op.create_index(_index_name(column), TASK_TABLE_NAME, [column])
+
+
+def downgrade():
+    for column in INDEXED_COLUMNS:
+        op.drop_index(_index_name(column), table_name=TASK_TABLE_NAME)
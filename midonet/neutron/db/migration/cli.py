@@ -12,15 +12,82 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 import os
 
 from alembic import config as alembic_config
+from alembic import util as alembic_util
+from oslo_config import cfg
+from oslo_db.sqlalchemy import session
+from sqlalchemy import orm
+
+from midonet.neutron.db import task
 from neutron.db.migration import cli as n_cli
 
 
 CONF = n_cli.CONF
 
 
+def _get_session():
+    engine = session.create_engine(CONF.database.connection)
+    return orm.sessionmaker(bind=engine, autocommit=True)()
+
+
+def do_purge_tasks(config, cmd):
+    created_before = None
+    if CONF.command.older_than is not None:
+        created_before = (datetime.datetime.utcnow() -
+                          datetime.timedelta(days=CONF.command.older_than))
+
+    deleted = task.purge_tasks(_get_session(), CONF.command.max_task_id,
+                               created_before=created_before,
+                               batch_size=CONF.command.batch_size)
+    alembic_util.msg(_('Purged %d tasks') % deleted)
+
+
+def do_compact_tasks(config, cmd):
+    deleted = task.compact_tasks(_get_session(),
+                                 CONF.command.max_task_id,
+                                 batch_size=CONF.command.batch_size)
+    alembic_util.msg(_('Compacted %d tasks') % deleted)
+
+
+def add_command_parsers(subparsers):
+    n_cli.add_command_parsers(subparsers)
+
+    parser = subparsers.add_parser('purge-tasks')
+    parser.add_argument('--max-task-id', type=int, required=True,
+                        help=_('Purge the tasks up to this ID, which must '
+                               'have been consumed by the MidoNet cluster'))
+    parser.add_argument('--older-than', type=int, metavar='DAYS',
+                        help=_('Only purge the tasks up to --max-task-id '
+                               'created more than this many days ago'))
+    parser.add_argument('--batch-size', type=int,
+                        default=task.PURGE_BATCH_SIZE,
+                        help=_('Number of tasks deleted per transaction'))
+    parser.set_defaults(func=do_purge_tasks)
+
+    parser = subparsers.add_parser('compact-tasks')
+    parser.add_argument('--max-task-id', type=int, required=True,
+                        help=_('Compact the tasks up to this ID, which must '
+                               'have been consumed by the MidoNet cluster'))
+    parser.add_argument('--batch-size', type=int,
+                        default=task.COMPACT_BATCH_SIZE,
+                        help=_('Number of resources compacted per '
+                               'transaction'))
+    parser.set_defaults(func=do_compact_tasks)
+
+
+command_opt = cfg.SubCommandOpt('command',
+                                title='Command',
+                                help=_('Available commands'),
+                                handler=add_command_parsers)
+
+# Replace the Neutron sub-commands with the extended set above.
+CONF.unregister_opt(n_cli.command_opt)
+CONF.register_cli_opt(command_opt)
+
+
 def get_alembic_config():
     config = alembic_config.Config(os.path.join(os.path.dirname(__file__),
                                                 'alembic.ini'))
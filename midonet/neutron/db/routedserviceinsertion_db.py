@@ -20,6 +20,9 @@ from midonet.neutron.extensions import routedserviceinsertion as rsi
 from neutron.common import exceptions as qexception
 from neutron.db import model_base
 
+# Maximum number of resource IDs in the IN clause of a binding query
+BINDING_QUERY_BATCH_SIZE = 500
+
 
 class ServiceRouterBinding(model_base.BASEV2):
     __tablename__ = 'midonet_servicerouterbindings'
@@ -29,7 +32,7 @@ class ServiceRouterBinding(model_base.BASEV2):
                               primary_key=True)
     router_id = sa.Column(sa.String(36),
                           sa.ForeignKey('routers.id'),
-                          nullable=False)
+                          nullable=False, index=True)
 
 
 class AttributeException(qexception.NeutronException):
@@ -59,9 +62,23 @@ class RoutedServiceInsertionDbMixin(object):
         return self._make_resource_router_id_dict(db, model)
 
     def _extend_resource_router_id_dict(self, context, resource, model):
-        binding = self._get_resource_router_id_binding(
-            context, resource['resource_id'], model)
-        resource[rsi.ROUTER_ID] = binding['router_id']
+        self._extend_resource_router_id_dicts(context, [resource], model)
+
+    def _extend_resource_router_id_dicts(self, context, resources, model):
+        """Set the router ID of the resources with batched binding queries.
+
+        Resources without a binding get a None router ID.
+        """
+        ids = [r['id'] for r in resources]
+        router_ids = {}
+        for i in range(0, len(ids), BINDING_QUERY_BATCH_SIZE):
+            bindings = self._get_resource_router_id_bindings(
+                context, model,
+                resource_ids=ids[i:i + BINDING_QUERY_BATCH_SIZE])
+            router_ids.update((b.resource_id, b.router_id) for b in bindings)
+        for resource in resources:
+            resource[rsi.ROUTER_ID] = router_ids.get(resource['id'])
+        return resources
 
     def _get_resource_router_id_binding(self, context, model,
                                         resource_id=None,
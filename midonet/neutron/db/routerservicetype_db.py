@@ -14,10 +14,17 @@
 #    under the License.
 
 import sqlalchemy as sa
+from sqlalchemy import orm
 
+from neutron.db import db_base_plugin_v2
+from neutron.db import l3_db
 from neutron.db import model_base
+from neutron.extensions import l3
 from neutron.extensions import routerservicetype as rst
 
+# Maximum number of router IDs in the IN clause of a binding query
+BINDING_QUERY_BATCH_SIZE = 500
+
 
 class RouterServiceTypeBinding(model_base.BASEV2):
     __tablename__ = 'midonet_routerservicetypebindings'
@@ -26,6 +33,10 @@ class RouterServiceTypeBinding(model_base.BASEV2):
                           primary_key=True)
     service_type_id = sa.Column(sa.String(36),
                                 nullable=False)
+    router = orm.relationship(
+        l3_db.Router,
+        backref=orm.backref('service_type_binding', uselist=False,
+                            cascade='all, delete-orphan'))
 
 
 class RouterServiceTypeDbMixin(object):
@@ -39,11 +50,44 @@ class RouterServiceTypeDbMixin(object):
             context.session.add(db)
         return self._make_router_service_type_id_dict(db)
 
-    def _extend_router_service_type_id_dict(self, context, router):
-        rsbind = self._get_router_service_type_id_binding(
-            context, router['id'])
+    def _extend_router_dict_service_type_id(self, router_res, router_db):
+        rsbind = router_db.service_type_binding
         if rsbind:
-            router[rst.SERVICE_TYPE_ID] = rsbind['service_type_id']
+            router_res[rst.SERVICE_TYPE_ID] = rsbind['service_type_id']
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
+        l3.ROUTERS, ['_extend_router_dict_service_type_id'])
+
+    def _router_service_type_query_hook(self, context, original_model,
+                                        query):
+        # Load the binding in the same query as the routers, so that listing
+        # routers does not query the binding of each router.
+        return query.options(orm.joinedload('service_type_binding'))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_model_query_hook(
+        l3_db.Router,
+        "router_service_type",
+        '_router_service_type_query_hook',
+        None,
+        None)
+
+    def _extend_router_service_type_id_dict(self, context, router):
+        self._extend_router_service_type_id_dicts(context, [router])
+
+    def _extend_router_service_type_id_dicts(self, context, routers):
+        """Set the service type ID of router dicts with batched queries."""
+        ids = [r['id'] for r in routers]
+        service_type_ids = {}
+        for i in range(0, len(ids), BINDING_QUERY_BATCH_SIZE):
+            query = self._model_query(context, RouterServiceTypeBinding)
+            query = query.filter(RouterServiceTypeBinding.router_id.in_(
+                ids[i:i + BINDING_QUERY_BATCH_SIZE]))
+            service_type_ids.update((b.router_id, b.service_type_id)
+                                    for b in query)
+        for router in routers:
+            if router['id'] in service_type_ids:
+                router[rst.SERVICE_TYPE_ID] = service_type_ids[router['id']]
+        return routers
 
     def _get_router_service_type_id_binding(self, context, router_id):
         query = self._model_query(context, RouterServiceTypeBinding)
@@ -14,13 +14,23 @@
 
 import collections
 import datetime
+import zlib
+
+from oslo_config import cfg
 from oslo_serialization import jsonutils
+import six
 import sqlalchemy as sa
 
+from midonet.neutron.common import config  # noqa
+from neutron.api.v2 import attributes
 from neutron.common import exceptions as n_exc
+from neutron.db import l3_db
 from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.db import securitygroups_db as sg_db
 from neutron import i18n
 from neutron.openstack.common import log as logging
+from neutron_lbaas.db.loadbalancer import loadbalancer_db as lb_db
 
 CREATE = "CREATE"
 DELETE = "DELETE"
@@ -39,10 +49,33 @@ VIP = "VIP"
 HEALTH_MONITOR = "HEALTHMONITOR"
 MEMBER = "MEMBER"
 PORT_BINDING = "PORTBINDING"
+# Only journaled in the 'journal' API dispatch mode
+ROUTER_INTERFACE = "ROUTERINTERFACE"
+POOL_HEALTH_MONITOR = "POOLHEALTHMONITOR"
 
 
 OP_IMPORT = 'IMPORT'
 OP_FLUSH = 'FLUSH'
+OP_COMPACT = 'COMPACT'
+
+IMPORT_PAGE_SIZE = 500
+PURGE_BATCH_SIZE = 1000
+COMPACT_BATCH_SIZE = 100
+
+# Data types whose tasks each carry the whole state of a resource, so that
+# a task supersedes the earlier ones of the same resource.
+COMPACTABLE_DATA_TYPES = [NETWORK, SUBNET, ROUTER, PORT, FLOATING_IP,
+                          SECURITY_GROUP, SECURITY_GROUP_RULE, POOL, VIP,
+                          HEALTH_MONITOR, MEMBER]
+
+# Data types no other task refers to.  Their tasks can be dropped entirely
+# once the resource is deleted.
+LEAF_DATA_TYPES = [FLOATING_IP, SECURITY_GROUP_RULE, VIP, MEMBER]
+
+# Prefixes of the compressed task data and of the delta encoded UPDATE task
+# data.  JSON text never starts with them.
+ZLIB_MARKER = b'zlib:'
+DELTA_MARKER = b'delta:'
 
 LOG = logging.getLogger(__name__)
 _LI = i18n._LI
@@ -65,28 +98,292 @@ class Task(model_base.BASEV2):
 
     id = sa.Column(sa.Integer(), primary_key=True)
     type = sa.Column(sa.String(length=36))
-    tenant_id = sa.Column(sa.String(255))
-    data_type = sa.Column(sa.String(length=36))
-    data = sa.Column(sa.Text(length=2 ** 24))
-    resource_id = sa.Column(sa.String(36))
-    transaction_id = sa.Column(sa.String(40))
-    created_at = sa.Column(sa.DateTime(), default=datetime.datetime.utcnow)
+    tenant_id = sa.Column(sa.String(255), index=True)
+    data_type = sa.Column(sa.String(length=36), index=True)
+    data = sa.Column(sa.LargeBinary(length=2 ** 24))
+    resource_id = sa.Column(sa.String(36), index=True)
+    transaction_id = sa.Column(sa.String(40), index=True)
+    created_at = sa.Column(sa.DateTime(), default=datetime.datetime.utcnow,
+                           index=True)
+
+
+def encode_task_data(data, delta=False):
+    """Serialize a resource dict for the data column of a task.
+
+    The data is JSON text, prefixed with DELTA_MARKER if it is a delta made
+    by make_delta.  When the task_data_compression option is set, it is
+    then compressed with zlib and prefixed with ZLIB_MARKER.
+    """
+    if data is None:
+        return None
+    encoded = jsonutils.dumps(data)
+    if isinstance(encoded, six.text_type):
+        encoded = encoded.encode('utf-8')
+    if delta:
+        encoded = DELTA_MARKER + encoded
+    if cfg.CONF.MIDONET.task_data_compression:
+        encoded = ZLIB_MARKER + zlib.compress(encoded)
+    return encoded
+
+
+def _unpack_task_data(raw):
+    if isinstance(raw, six.text_type):
+        raw = raw.encode('utf-8')
+    if raw.startswith(ZLIB_MARKER):
+        raw = zlib.decompress(raw[len(ZLIB_MARKER):])
+    if raw.startswith(DELTA_MARKER):
+        return jsonutils.loads(raw[len(DELTA_MARKER):]), True
+    return jsonutils.loads(raw), False
+
+
+def decode_task_data(raw):
+    """Deserialize the data column of a task written in any encoding.
+
+    The data of a delta encoded UPDATE task is returned as the delta; use
+    get_resource_state to get the state of the resource it results in.
+    """
+    if raw is None:
+        return None
+    return _unpack_task_data(raw)[0]
+
+
+def is_delta_task_data(raw):
+    return raw is not None and _unpack_task_data(raw)[1]
+
+
+def make_delta(old, new):
+    """Return the delta that turns the resource dict old into new."""
+    return {'changed': dict((k, v) for k, v in six.iteritems(new)
+                            if k not in old or old[k] != v),
+            'removed': [k for k in old if k not in new]}
+
+
+def apply_delta(state, delta):
+    """Return the resource dict resulting from a delta made by make_delta."""
+    state = dict(state)
+    state.update(delta['changed'])
+    for key in delta['removed']:
+        state.pop(key, None)
+    return state
+
+
+def get_resource_state(session, data_type, resource_id, max_task_id=None,
+                       limit=None, exclude_transaction_id=None):
+    """Rebuild the latest journaled state of a resource.
+
+    The tasks of the resource are read backwards from max_task_id up to the
+    last full snapshot, and the deltas on top of it are applied.
+
+    :param limit: The maximum number of tasks to read
+    :param exclude_transaction_id: Ignore the tasks of this transaction
+    :returns: The tuple of the resource dict and the number of deltas that
+              were applied, or (None, 0) if the resource has no state in the
+              journal or no full snapshot within limit tasks
+    """
+    query = session.query(Task.type, Task.data).filter(
+        Task.data_type == data_type, Task.resource_id == resource_id)
+    if max_task_id is not None:
+        query = query.filter(Task.id <= max_task_id)
+    if exclude_transaction_id is not None:
+        query = query.filter(Task.transaction_id != exclude_transaction_id)
+    query = query.order_by(Task.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    deltas = []
+    for t in query:
+        if t.type == DELETE or t.data is None:
+            break
+        data, is_delta = _unpack_task_data(t.data)
+        if not is_delta:
+            for delta in reversed(deltas):
+                data = apply_delta(data, delta)
+            return data, len(deltas)
+        deltas.append(data)
+    return None, 0
+
+
+def _encode_update_task_data(session, data_type, resource_id, data):
+    """Encode the data of an UPDATE task as a delta when possible.
+
+    A full snapshot is written instead when the previous state cannot be
+    rebuilt or when task_full_update_interval - 1 deltas already follow
+    the last one, so that at most that many deltas need to be applied to
+    rebuild a state.
+    """
+    interval = cfg.CONF.MIDONET.task_full_update_interval
+    state, deltas = get_resource_state(session, data_type, resource_id,
+                                       limit=interval)
+    if state is None or deltas + 1 >= interval:
+        return encode_task_data(data)
+    return encode_task_data(make_delta(state, data), delta=True)
 
 
 def create_task(context, type, task_id=None, data_type=None,
                 resource_id=None, data=None):
 
     with context.session.begin(subtransactions=True):
+        if (type == UPDATE and data is not None and
+                cfg.CONF.MIDONET.task_update_encoding ==
+                config.TASK_UPDATE_DELTA):
+            encoded = _encode_update_task_data(context.session, data_type,
+                                               resource_id, data)
+        else:
+            encoded = encode_task_data(data)
         db = Task(id=task_id,
                   type=type,
                   tenant_id=context.tenant,
                   data_type=data_type,
-                  data=None if data is None else jsonutils.dumps(data),
+                  data=encoded,
                   resource_id=resource_id,
                   transaction_id=context.request_id)
         context.session.add(db)
 
 
+def create_tasks(context, type, data_type, items):
+    """Write a task for each of the resource dicts in items.
+
+    All the tasks are written with a single executemany INSERT through
+    SQLAlchemy Core, bypassing the ORM unit of work.  It is meant for the
+    bulk operations where many resources of the same type are journaled
+    at once.
+    """
+    if not items:
+        return
+    rows = [{'type': type,
+             'tenant_id': context.tenant,
+             'data_type': data_type,
+             'data': encode_task_data(item),
+             'resource_id': item['id'],
+             'transaction_id': context.request_id} for item in items]
+    with context.session.begin(subtransactions=True):
+        context.session.execute(Task.__table__.insert(), rows)
+
+
+def purge_tasks(session, max_task_id, created_before=None,
+                batch_size=PURGE_BATCH_SIZE):
+    """Delete tasks already consumed by the MidoNet cluster.
+
+    Tasks whose ID is not greater than max_task_id are deleted, oldest
+    first.  max_task_id must be the last task consumed by the cluster; the
+    age of a task says nothing about whether it was consumed, so
+    created_before can only narrow the purge to the tasks created before
+    it.  Each batch of batch_size tasks is deleted in
+    its own short transaction so that the journal writers are never blocked
+    for long; the session must not be in a transaction when this is called.
+
+    :returns: The number of deleted tasks
+    """
+    if max_task_id is None:
+        raise ValueError("max_task_id is required")
+
+    deleted = 0
+    while True:
+        with session.begin(subtransactions=True):
+            query = session.query(Task.id).filter(Task.id <= max_task_id)
+            if created_before is not None:
+                query = query.filter(Task.created_at < created_before)
+            ids = [row.id for row in query.order_by(Task.id).limit(
+                batch_size)]
+            if not ids:
+                break
+            session.query(Task).filter(Task.id.in_(ids)).delete(
+                synchronize_session=False)
+        deleted += len(ids)
+    LOG.info(_LI("Purged %d tasks from the task journal"), deleted)
+    return deleted
+
+
+def _superseded_task_ids(data_type, tasks):
+    """Return the IDs of the tasks of a resource that can be dropped.
+
+    The first CREATE task is kept where it is so that the resource still
+    exists before any task referring to it, and the last UPDATE or DELETE
+    task is kept so that the final state is preserved.  The UPDATE tasks in
+    between are superseded.  A leaf resource that is created and deleted
+    within the tasks is dropped altogether.
+    """
+    first, last = tasks[0], tasks[-1]
+    if (first.type == CREATE and last.type == DELETE and
+            data_type in LEAF_DATA_TYPES):
+        keep = set()
+    else:
+        keep = set([last.id])
+        if first.type == CREATE:
+            keep.add(first.id)
+    return [t.id for t in tasks if t.id not in keep]
+
+
+def _expand_delta_task(session, task_id, data_type, resource_id):
+    """Replace the data of a delta encoded task with the full state."""
+    raw = session.query(Task.data).filter(Task.id == task_id).scalar()
+    if not is_delta_task_data(raw):
+        return
+    state, _deltas = get_resource_state(session, data_type, resource_id,
+                                        max_task_id=task_id)
+    if state is not None:
+        session.query(Task).filter(Task.id == task_id).update(
+            {'data': encode_task_data(state)}, synchronize_session=False)
+
+
+def compact_tasks(session, max_task_id, batch_size=COMPACT_BATCH_SIZE):
+    """Drop the tasks superseded by later tasks of the same resource.
+
+    Only the tasks whose ID is not greater than max_task_id are compacted.
+    It must be a task ID the MidoNet cluster has already consumed, so that
+    the cluster never sees the journal change under its read position.
+    Resources are processed batch_size at a time, each batch in its own
+    short transaction; the session must not be in a transaction when this
+    is called.
+
+    :returns: The number of deleted tasks
+    """
+    deleted = 0
+    marker = None
+    while True:
+        query = session.query(Task.resource_id).filter(
+            Task.id <= max_task_id,
+            Task.data_type.in_(COMPACTABLE_DATA_TYPES))
+        if marker is not None:
+            query = query.filter(Task.resource_id > marker)
+        query = query.group_by(Task.resource_id).having(
+            sa.func.count(Task.id) > 1)
+        resource_ids = [row.resource_id for row in query.order_by(
+            Task.resource_id).limit(batch_size)]
+        if not resource_ids:
+            break
+        marker = resource_ids[-1]
+
+        with session.begin(subtransactions=True):
+            tasks = session.query(
+                Task.id, Task.type, Task.data_type, Task.resource_id).filter(
+                Task.id <= max_task_id,
+                Task.data_type.in_(COMPACTABLE_DATA_TYPES),
+                Task.resource_id.in_(resource_ids)).order_by(Task.id)
+            by_resource = collections.defaultdict(list)
+            for t in tasks:
+                by_resource[(t.data_type, t.resource_id)].append(t)
+
+            ids = []
+            for (data_type, resource_id), rows in by_resource.items():
+                superseded = _superseded_task_ids(data_type, rows)
+                last = rows[-1]
+                if (superseded and last.type == UPDATE and
+                        last.id not in superseded):
+                    # The deltas the last task is based on are going away.
+                    _expand_delta_task(session, last.id, data_type,
+                                       resource_id)
+                ids.extend(superseded)
+            if ids:
+                session.query(Task).filter(Task.id.in_(ids)).delete(
+                    synchronize_session=False)
+        deleted += len(ids)
+    LOG.info(_LI("Compacted the task journal up to task %(id)d: "
+                 "%(count)d tasks deleted"),
+             {'id': max_task_id, 'count': deleted})
+    return deleted
+
+
 class MidonetClusterException(n_exc.NeutronException):
     message = _("Midonet Cluster Error: %(msg)s")
 
@@ -102,45 +399,212 @@ class MidoClusterMixin(object):
         finally:
             context.session.execute('UNLOCK TABLES')
 
-    def _import(self, context):
-        try:
-            # lock the entire database so we can take a snapshot of the
-            # data we need.
-            context.session.execute('FLUSH TABLES WITH READ LOCK')
-
-            database = collections.OrderedDict({
-                NETWORK: self.get_networks(context),
-                SUBNET: self.get_subnets(context),
-                PORT: self.get_ports(context),
-                ROUTER: self.get_routers(context),
-                FLOATING_IP: self.get_floatingips(context),
-                SECURITY_GROUP: self.get_security_groups(context),
-                SECURITY_GROUP_RULE: self.get_security_group_rules(context),
-                POOL: self.get_pools(context),
-                VIP: self.get_vips(context),
-                HEALTH_MONITOR: self.get_health_monitors(context),
-                MEMBER: self.get_members(context)})
-
-            # record how much items we have processed so far. We compare
-            # this to another count after we lock midonet_tasks to make
-            # sure nothing snuck in between the locks.
-            task_count = context.session.query(Task).count()
-        finally:
-            context.session.execute('UNLOCK TABLES')
+    def _import_sources(self):
+        return [(NETWORK, models_v2.Network, self._make_network_dict),
+                (SUBNET, models_v2.Subnet, self._make_subnet_dict),
+                (PORT, models_v2.Port, self._make_port_dict),
+                (ROUTER, l3_db.Router, self._make_router_dict),
+                (FLOATING_IP, l3_db.FloatingIP, self._make_floatingip_dict),
+                (SECURITY_GROUP, sg_db.SecurityGroup,
+                 self._make_security_group_dict),
+                (SECURITY_GROUP_RULE, sg_db.SecurityGroupRule,
+                 self._make_security_group_rule_dict),
+                (POOL, lb_db.Pool, self._make_pool_dict),
+                (VIP, lb_db.Vip, self._make_vip_dict),
+                (HEALTH_MONITOR, lb_db.HealthMonitor,
+                 self._make_health_monitor_dict),
+                (MEMBER, lb_db.Member, self._make_member_dict)]
+
+    def _import_data_type(self, context, data_type, model, make_dict):
+        """Write a CREATE task for every resource of the model.
+
+        The resources are read and written IMPORT_PAGE_SIZE at a time so
+        that the memory used does not depend on the number of resources.
+        """
+        marker = None
+        while True:
+            query = self._model_query(context, model).order_by(model.id)
+            if marker is not None:
+                query = query.filter(model.id > marker)
+            items = [make_dict(db) for db in query.limit(IMPORT_PAGE_SIZE)]
+            if not items:
+                return
+            create_tasks(context, CREATE, data_type, items)
+            marker = items[-1]['id']
+
+    def _lowest_in_flight_task_id(self, context):
+        """Return the lowest task ID that may not be committed yet.
+
+        Task IDs are allocated on insert but only become visible on commit,
+        so a task in flight leaves a gap in the committed IDs.  Rolled back,
+        purged and compacted tasks leave gaps as well, but for good, so a
+        gap is only in flight if an uncommitted read sees a task in it.
+        The gaps are read a page at a time, outside of any snapshot and
+        without locking the tasks.
+
+        Called before the import snapshot is taken, this bounds the tasks
+        the snapshot may miss: the ones in flight, and the ones written
+        after the largest task ID committed so far.
+        """
+        engine = context.session.bind
+        tasks = Task.__table__
+        next_task = tasks.alias()
+        later_task = tasks.alias()
+        # The gaps in the committed IDs, each with the ID that ends it,
+        # which is NULL for the gap above the largest ID.
+        gap_end = sa.select([sa.func.min(later_task.c.id)]).where(
+            later_task.c.id > tasks.c.id).as_scalar()
+        gaps = sa.select([tasks.c.id + 1, gap_end]).select_from(
+            tasks.outerjoin(next_task, next_task.c.id == tasks.c.id + 1)
+        ).where(next_task.c.id.is_(None)).order_by(tasks.c.id).limit(
+            IMPORT_PAGE_SIZE)
+
+        committed = engine.connect()
+        dirty = engine.connect().execution_options(
+            isolation_level='READ UNCOMMITTED')
         try:
-            context.session.execute('LOCK TABLES midonet_tasks WRITE')
-            with context.session.begin(subtransactions=True):
-                if task_count != context.session.query(Task).count():
-                    error_msg = ("The database has been updated while the "
-                                 "rebuild operation is in progress")
-                    raise MidonetClusterException(msg=error_msg)
-
-                for key in database:
-                    for item in database[key]:
-                        create_task(context, CREATE, data_type=key,
-                                    resource_id=item['id'], data=item)
+            marker = 0
+            while True:
+                page = committed.execute(
+                    gaps.where(tasks.c.id >= marker)).fetchall()
+                if not page:
+                    return marker
+                bounded = [sa.and_(tasks.c.id >= start, tasks.c.id < end)
+                           for start, end in page if end is not None]
+                if bounded:
+                    in_flight = dirty.execute(
+                        sa.select([sa.func.min(tasks.c.id)]).where(
+                            sa.or_(*bounded))).scalar()
+                    if in_flight is not None:
+                        return in_flight
+                if page[-1][1] is None:
+                    return page[-1][0]
+                marker = page[-1][0]
         finally:
-            context.session.execute('UNLOCK TABLES')
+            dirty.close()
+            committed.close()
+
+    def _replay_concurrent_tasks(self, context, cut_task_id,
+                                 in_flight_task_id):
+        """Move to the end of the journal the tasks the snapshot misses.
+
+        The tasks committed by other requests after the snapshot was taken
+        may have got an ID lower than those of the import tasks, so the
+        MidoNet cluster would apply the stale snapshot over them.  They are
+        moved after the import tasks: copied to the end of the journal, and
+        the originals deleted so that the cluster does not see their CREATE
+        tasks twice.  Only the tasks from 'in_flight_task_id' on are looked
+        at, and the snapshot is compared with the latest tasks a page at a
+        time.
+
+        This relies on InnoDB locking reads, which see the latest committed
+        rows instead of the snapshot and wait for the rows not committed
+        yet, so it is only used on MySQL.
+        """
+        session = context.session
+        window = (Task.id >= in_flight_task_id,
+                  Task.transaction_id != context.request_id)
+        concurrent = []
+        marker = None
+        while True:
+            query = session.query(Task).filter(*window)
+            if marker is not None:
+                query = query.filter(Task.id > marker)
+            page = query.order_by(Task.id).limit(
+                IMPORT_PAGE_SIZE).with_for_update(read=True).all()
+            if not page:
+                break
+            marker = page[-1].id
+            snapshot_ids = set()
+            if page[0].id <= cut_task_id:
+                snapshot_ids.update(row.id for row in session.query(
+                    Task.id).filter(Task.id.between(page[0].id,
+                                                    min(marker, cut_task_id)),
+                                    *window))
+            concurrent.extend(t for t in page if t.id not in snapshot_ids)
+        if not concurrent:
+            return
+
+        LOG.info(_LI("Replaying %d tasks written during the import"),
+                 len(concurrent))
+        columns = ('type', 'tenant_id', 'data_type', 'resource_id',
+                   'transaction_id', 'created_at')
+        rows = []
+        # Latest state of the resources, for the deltas to be replayed
+        states = {}
+        for t in concurrent:
+            row = dict((c, getattr(t, c)) for c in columns)
+            row['data'] = t.data
+            key = (t.data_type, t.resource_id)
+            if t.type == DELETE or t.data is None:
+                states[key] = None
+            else:
+                data, is_delta = _unpack_task_data(t.data)
+                if not is_delta:
+                    states[key] = data
+                else:
+                    # A delta applies to the state before the task, which
+                    # the replayed tasks do not necessarily follow.
+                    if key not in states:
+                        states[key], _deltas = get_resource_state(
+                            session, t.data_type, t.resource_id,
+                            max_task_id=t.id,
+                            exclude_transaction_id=context.request_id)
+                    if states[key] is not None:
+                        states[key] = apply_delta(states[key], data)
+                        row['data'] = encode_task_data(states[key])
+            rows.append(row)
+        session.execute(Task.__table__.insert(), rows)
+
+        ids = [t.id for t in concurrent]
+        for i in range(0, len(ids), IMPORT_PAGE_SIZE):
+            session.query(Task).filter(
+                Task.id.in_(ids[i:i + IMPORT_PAGE_SIZE])).delete(
+                synchronize_session=False)
+
+    def _import(self, context):
+        """Write a CREATE task for every resource.
+
+        The resources are read from a REPEATABLE READ snapshot so they are
+        consistent with each other.  The largest task ID in the snapshot is
+        the cut point.
+
+        On MySQL the other requests keep writing to the database, and the
+        tasks they commit after the snapshot are replayed after the imported
+        ones.  The lowest task ID in flight is read before the snapshot, so
+        that only the tasks from there on are compared with it.  PostgreSQL
+        locking reads return the rows of the snapshot, so the concurrent
+        tasks cannot be found that way; the task table is locked instead,
+        which waits for the writers in flight and blocks the new ones until
+        the import is committed.
+        """
+        session = context.session
+        dialect = session.bind.dialect.name
+        if dialect == 'mysql':
+            in_flight_task_id = self._lowest_in_flight_task_id(context)
+        with session.begin(subtransactions=True):
+            if dialect in ('mysql', 'postgresql'):
+                session.connection(execution_options={
+                    'isolation_level': 'REPEATABLE READ'})
+            if dialect == 'postgresql':
+                # The lock must be taken before the snapshot is.
+                session.execute('LOCK TABLE midonet_tasks '
+                                'IN SHARE ROW EXCLUSIVE MODE')
+            # The first read of the transaction establishes the snapshot.
+            cut_task_id = session.query(sa.func.max(Task.id)).scalar() or 0
+
+            for data_type, model, make_dict in self._import_sources():
+                self._import_data_type(context, data_type, model, make_dict)
+
+            if dialect == 'mysql':
+                self._replay_concurrent_tasks(context, cut_task_id,
+                                             in_flight_task_id)
+
+    def _compact(self, context, max_task_id):
+        if not attributes.is_attr_set(max_task_id):
+            error_msg = "max_task_id is required to compact the tasks"
+            raise MidonetClusterException(msg=error_msg)
+        compact_tasks(context.session, max_task_id)
 
     def create_cluster(self, context, cluster):
         LOG.info(_LI('MidoClusterMixin.create_cluster called: cluster=%r'),
@@ -151,6 +615,8 @@ class MidoClusterMixin(object):
             self._flush(context)
         elif op == OP_IMPORT:
             self._import(context)
+        elif op == OP_COMPACT:
+            self._compact(context, cluster['cluster'].get('max_task_id'))
 
         # Neutron assumes that any create_* call returns a dictionary. Even
         # though we do nothing with 'cluster', we still return it back to
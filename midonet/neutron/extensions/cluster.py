@@ -16,6 +16,7 @@
 import abc
 
 from neutron.api import extensions
+from neutron.api.v2 import attributes
 from neutron.api.v2 import base
 from neutron import manager
 
@@ -30,8 +31,13 @@ RESOURCE_ATTRIBUTE_MAP = {
                       'validate': {'type:string': None},
                       'is_visible': True, 'default': None},
         'op': {'allow_post': True, 'allow_put': False,
-               'validate': {'type:values': ['FLUSH', 'IMPORT']},
+               'validate': {'type:values': ['FLUSH', 'IMPORT', 'COMPACT']},
                'is_visible': True, 'default': None},
+        'max_task_id': {'allow_post': True, 'allow_put': False,
+                        'convert_to': attributes.convert_to_int,
+                        'validate': {'type:non_negative': None},
+                        'is_visible': False,
+                        'default': attributes.ATTR_NOT_SPECIFIED},
     }
 }
 
@@ -41,7 +41,13 @@ RESOURCE_ATTRIBUTE_MAP = {
                          'required_by_policy': True},
         'write_version': {'allow_post': False, 'allow_put': True,
                           'validate': {'type:regex': '^(\d+\.\d+)$'},
-                          'is_visible': True, 'required_by_policy': True}
+                          'is_visible': True, 'required_by_policy': True},
+        'api_circuit_state': {'allow_post': False, 'allow_put': False,
+                              'is_visible': True},
+        'api_failure_count': {'allow_post': False, 'allow_put': False,
+                              'is_visible': True},
+        'suppressed_updates': {'allow_post': False, 'allow_put': False,
+                               'is_visible': True}
     }
 }
 
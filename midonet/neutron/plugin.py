@@ -17,12 +17,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import functools
+
 from oslo_config import cfg
-from oslo_db import exception as db_exc
 from oslo_utils import excutils
 from oslo_utils import importutils
 
 from midonet.neutron import api
+from midonet.neutron.common import circuit_breaker
+from midonet.neutron.common import config
+from midonet.neutron.common import dispatcher
+from midonet.neutron.common import http_pool
+from midonet.neutron.common import lock
 from midonet.neutron.common import util
 from midonet.neutron.db import db_util
 from midonet.neutron.db import routedserviceinsertion_db as rsi_db
@@ -38,11 +45,12 @@ from neutron.common import constants as n_const
 from neutron.common import exceptions as n_exc
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
-from neutron.common import utils
+from neutron import context as n_context
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
 from neutron.db import db_base_plugin_v2
 from neutron.db import external_net_db
+from neutron.db import l3_db
 from neutron.db import l3_gwmode_db
 from neutron.db import portbindings_db
 from neutron.db import securitygroups_db
@@ -94,10 +102,26 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         # Instantiate MidoNet API client
         conf = cfg.CONF.MIDONET
         neutron_extensions.append_api_extensions_path(extensions.__path__)
+        if conf.api_connection_pooling:
+            http_pool.install(conf.api_connection_pool_size,
+                              conf.api_connection_idle_timeout)
         self.api_cli = client.MidonetClient(conf.midonet_uri, conf.username,
                                             conf.password,
                                             project_id=conf.project_id)
 
+        self.api_breaker = circuit_breaker.CircuitBreaker(
+            conf.api_failure_threshold, conf.api_reset_timeout)
+        self.journal_only = (
+            conf.api_dispatch_mode == config.API_DISPATCH_JOURNAL)
+        self.dispatcher = None
+        # Number of updates that left a resource unchanged, per resource.
+        self.suppressed_updates = collections.Counter()
+        # Default security group IDs known to exist, by tenant ID
+        self._default_sg_ids = {}
+        if conf.api_dispatch_mode == config.API_DISPATCH_ASYNC:
+            self.dispatcher = dispatcher.ApiDispatcher(
+                conf.api_worker_pool_size)
+
         self.setup_rpc()
 
         self.base_binding_dict = {
@@ -111,6 +135,38 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             cfg.CONF.network_scheduler_driver
         )
 
+    def get_system(self, context, id, fields=None):
+        """Report the state of the MidoNet API circuit breaker.
+
+        The numbers of no-op updates suppressed per resource are reported as
+        well.
+        """
+        system = {'id': id,
+                  'api_circuit_state': self.api_breaker.state,
+                  'api_failure_count': self.api_breaker.failure_count,
+                  'suppressed_updates': dict(self.suppressed_updates)}
+        return self._fields(system, fields)
+
+    def _is_noop_update(self, resource, original, updated):
+        """Return True if an update left the resource unchanged.
+
+        Such updates, like the periodic port refreshes of Nova, are neither
+        written to the task journal nor sent to MidoNet.  They are counted
+        per resource in 'suppressed_updates'.
+        """
+        def _normalize(res):
+            res = dict(res)
+            if 'security_groups' in res:
+                res['security_groups'] = sorted(res['security_groups'])
+            return res
+
+        if _normalize(original) != _normalize(updated):
+            return False
+        self.suppressed_updates[resource] += 1
+        LOG.debug("Suppressed no-op update of %(resource)s %(id)s",
+                  {'resource': resource, 'id': updated['id']})
+        return True
+
     def setup_rpc(self):
         # RPC support
         self.topic = topics.PLUGIN
@@ -122,17 +178,131 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         # Consume from all consumers in a thread
         self.conn.consume_in_threads()
 
-    def _process_create_network(self, context, network):
+    def _dispatch(self, context, key, method, *args, **kwargs):
+        """Call a method of the MidoNet API client.
+
+        In the 'sync' dispatch mode the method is called right away.  If it
+        fails, 'on_error' is called with the request context and the error
+        before the error is re-raised.
+
+        In the 'async' dispatch mode the method is called by the dispatcher
+        once the current transaction of the context is committed, after the
+        preceding calls made with the same key.  If it fails, 'on_error' is
+        called with an admin context and the error.
+
+        In the 'journal' dispatch mode the method is not called at all; the
+        MidoNet cluster learns about the change from the task journal.
+
+        The calls go through the API circuit breaker, which fails them right
+        away while the MidoNet API is unavailable.
+
+        :param key: The ID of the resource the call is ordered by, or a
+                    tuple of the IDs of the resources it depends on
+        :param method: The name of the MidoNet API client method
+        :param on_error: The callable run when the method fails
+        """
+        if self.journal_only:
+            return
+
+        func = functools.partial(self.api_breaker.call,
+                                 getattr(self.api_cli, method))
+        return self._dispatch_call(context, key, func, args,
+                                   kwargs.pop('on_error', None))
+
+    def _dispatch_call(self, context, key, func, args, on_error):
+        if self.dispatcher is None:
+            try:
+                return func(*args)
+            except Exception as ex:
+                if on_error is None:
+                    raise
+                with excutils.save_and_reraise_exception():
+                    on_error(context, ex)
+
+        def _on_error(ex):
+            on_error(n_context.get_admin_context(), ex)
+
+        self.dispatcher.submit_after_commit(
+            context.session, key, func, args,
+            on_error=None if on_error is None else _on_error)
+
+    def _router_interface_key(self, context, router_id, info):
+        # Router interface calls depend on both the router and the network
+        # of the interface port.
+        subnet = db_util.get_subnet(context, info['subnet_id'])
+        return router_id, subnet.network_id if subnet else None
+
+    def _ensure_default_security_group_cached(self, context, tenant_id):
+        """Ensure the default security group of the tenant exists.
+
+        Unlike _ensure_default_security_group, the database is only queried
+        the first time for each tenant, until the default security group is
+        deleted through this plugin.  The ID is only cached once the default
+        security group is committed.
+        """
+        sg_id = self._default_sg_ids.get(tenant_id)
+        if sg_id is None:
+            sg_id = self._ensure_default_security_group(context, tenant_id)
+            db_util.cache_after_commit(context.session, self._default_sg_ids,
+                                       tenant_id, sg_id)
+        return sg_id
+
+    def _dispatch_bulk(self, context, items, key_func, method,
+                       bulk_method=None, delete_method=None, on_error=None):
+        """Create a batch of resources with the MidoNet API client.
+
+        The batch is created by a single dispatched call, ordered after the
+        preceding calls made with the keys returned by 'key_func' for its
+        items.  If 'bulk_method' is given, all the items are passed to that
+        method of the client.  Otherwise 'method' is called for each item,
+        and if one of the calls fails, the items already created are deleted
+        from MidoNet with 'delete_method', so that the batch fails as a
+        whole.
+
+        :param on_error: The callable run with the context and the error
+                         when the batch fails
+        """
+        if not items:
+            return
+
+        keys = tuple(collections.OrderedDict.fromkeys(
+            key_func(item) for item in items))
+        if bulk_method is not None:
+            self._dispatch(context, keys, bulk_method, items,
+                           on_error=on_error)
+            return
+        if self.journal_only:
+            return
+
+        def _create_all(items):
+            created = []
+            try:
+                for item in items:
+                    self.api_breaker.call(getattr(self.api_cli, method),
+                                          item)
+                    created.append(item)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    for item in reversed(created):
+                        try:
+                            self.api_breaker.call(
+                                getattr(self.api_cli, delete_method),
+                                item['id'])
+                        except Exception:
+                            LOG.exception(_LE("Failed to delete %s from "
+                                              "MidoNet after a failed bulk "
+                                              "creation"), item['id'])
+
+        self._dispatch_call(context, keys, _create_all, (items,), on_error)
+
+    def _create_network_db(self, context, network):
 
         net_data = network['network']
-        tenant_id = self._get_tenant_id_for_create(context, net_data)
-        net_data['tenant_id'] = tenant_id
-        self._ensure_default_security_group(context, tenant_id)
+        net_data['tenant_id'] = self._get_tenant_id_for_create(context,
+                                                               net_data)
 
         with context.session.begin(subtransactions=True):
             net = super(MidonetMixin, self).create_network(context, network)
-            task.create_task(context, task.CREATE, data_type=task.NETWORK,
-                             resource_id=net['id'], data=net)
             self._process_l3_create(context, net, net_data)
 
         return net
@@ -146,19 +316,63 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         LOG.info(_LI('MidonetMixin.create_network called: network=%r'),
                  network)
 
-        net = self._process_create_network(context, network)
+        self._ensure_default_security_group_cached(
+            context, self._get_tenant_id_for_create(context,
+                                                    network['network']))
+
+        with context.session.begin(subtransactions=True):
+            net = self._create_network_db(context, network)
+            task.create_task(context, task.CREATE, data_type=task.NETWORK,
+                             resource_id=net['id'], data=net)
 
-        try:
-            self.api_cli.create_network(net)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create a network %(net_id)s in Midonet:"
                           "%(err)s"), {"net_id": net["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_network(context, net['id'])
+            super(MidonetMixin, self).delete_network(context, net['id'])
+
+        self._dispatch(context, net['id'], 'create_network', net,
+                       on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_network exiting: net=%r"), net)
         return net
 
+    @util.handle_api_error
+    def create_network_bulk(self, context, networks):
+        """Create multiple Neutron networks.
+
+        The default security group of each tenant is ensured once, all the
+        networks are created in one transaction and journaled with a single
+        insert.  The MidoNet client has no bulk network API, so their bridges
+        are then created one by one, and if any of them fails, all the
+        networks are deleted from MidoNet and Neutron again.
+        """
+        LOG.info(_LI('MidonetMixin.create_network_bulk called: '
+                     'networks=%r'), networks)
+
+        items = networks['networks']
+        tenant_ids = set(self._get_tenant_id_for_create(context, n['network'])
+                         for n in items)
+        for tenant_id in tenant_ids:
+            self._ensure_default_security_group_cached(context, tenant_id)
+
+        with context.session.begin(subtransactions=True):
+            nets = [self._create_network_db(context, n) for n in items]
+            task.create_tasks(context, task.CREATE, task.NETWORK, nets)
+
+        def _rollback(context, ex):
+            LOG.error(_LE("Failed to create bulk networks %(nets)s in "
+                          "Midonet: %(err)s"), {"nets": nets, "err": ex})
+            for net in nets:
+                super(MidonetMixin, self).delete_network(context, net['id'])
+
+        self._dispatch_bulk(context, nets, lambda n: n['id'],
+                            'create_network', delete_method='delete_network',
+                            on_error=_rollback)
+
+        LOG.info(_LI("MidonetMixin.create_network_bulk exiting: nets=%r"),
+                 nets)
+        return nets
+
     @util.handle_api_error
     def update_network(self, context, id, network):
         """Update Neutron network.
@@ -170,28 +384,32 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                      "network=%(network)r"), {'id': id, 'network': network})
 
         with context.session.begin(subtransactions=True):
+            original = self.get_network(context, id)
             net = super(MidonetMixin, self).update_network(
                 context, id, network)
-            task.create_task(context, task.UPDATE, data_type=task.NETWORK,
-                             resource_id=id, data=net)
-
             self._process_l3_update(context, net, network['network'])
-            self.api_cli.update_network(id, net)
+
+            if not self._is_noop_update('network', original, net):
+                task.create_task(context, task.UPDATE,
+                                 data_type=task.NETWORK, resource_id=id,
+                                 data=net)
+                self._dispatch(context, id, 'update_network', id, net)
 
         LOG.info(_LI("MidonetMixin.update_network exiting: net=%r"), net)
         return net
 
     @util.handle_api_error
-    @utils.synchronized('midonet-network-lock', external=True)
-    @util.retry_on_error(2, 1, db_exc.DBError)
+    @util.synchronized_on('midonet-network-lock',
+                          lambda self, context, id: id)
+    @util.retry_on_db_conflict()
     def delete_network(self, context, id):
         """Delete a network and its corresponding MidoNet bridge.
 
-        This method is wrapped by 'retry_on_error' decorator because concurrent
-        requests to the API server often causes DB deadlock error because
-        eventlet green threads do not yield properly when they block inside
-        the transaction.  This hack should no longer become available once
-        we moved to the model where API requests are asynchronous or when
+        This method is wrapped by 'retry_on_db_conflict' decorator because
+        concurrent requests to the API server often causes DB deadlock error
+        because eventlet green threads do not yield properly when they block
+        inside the transaction.  This hack should no longer become available
+        once we moved to the model where API requests are asynchronous or when
         eventlet-compatible mysqlconnector is used for the DB driver instead.
         """
         LOG.info(_LI("MidonetMixin.delete_network called: id=%r"), id)
@@ -202,10 +420,13 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                              resource_id=id)
             super(MidonetMixin, self).delete_network(context, id)
 
-            self.api_cli.delete_network(id)
+            self._dispatch(context, id, 'delete_network', id)
 
         LOG.info(_LI("MidonetMixin.delete_network exiting: id=%r"), id)
 
+    def _create_subnet_db(self, context, subnet):
+        return super(MidonetMixin, self).create_subnet(context, subnet)
+
     @util.handle_api_error
     def create_subnet(self, context, subnet):
         """Create Neutron subnet.
@@ -214,23 +435,56 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         """
         LOG.info(_LI("MidonetMixin.create_subnet called: subnet=%r"), subnet)
 
-        sn_entry = super(MidonetMixin, self).create_subnet(context, subnet)
-        task.create_task(context, task.CREATE, data_type=task.SUBNET,
-                         resource_id=sn_entry['id'], data=sn_entry)
+        with context.session.begin(subtransactions=True):
+            sn_entry = self._create_subnet_db(context, subnet)
+            task.create_task(context, task.CREATE, data_type=task.SUBNET,
+                             resource_id=sn_entry['id'], data=sn_entry)
 
-        try:
-            self.api_cli.create_subnet(sn_entry)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create a subnet %(s_id)s in Midonet:"
                           "%(err)s"), {"s_id": sn_entry["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_subnet(context,
-                                                        sn_entry['id'])
+            super(MidonetMixin, self).delete_subnet(context, sn_entry['id'])
+
+        self._dispatch(context, sn_entry['network_id'], 'create_subnet',
+                       sn_entry, on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_subnet exiting: sn_entry=%r"),
                  sn_entry)
         return sn_entry
 
+    @util.handle_api_error
+    def create_subnet_bulk(self, context, subnets):
+        """Create multiple Neutron subnets.
+
+        All the subnets are created in one transaction and journaled with a
+        single insert.  The MidoNet client has no bulk subnet API, so their
+        DHCP entries are then created one by one, and if any of them fails,
+        all the subnets are deleted from MidoNet and Neutron again.
+        """
+        LOG.info(_LI("MidonetMixin.create_subnet_bulk called: subnets=%r"),
+                 subnets)
+
+        with context.session.begin(subtransactions=True):
+            sn_entries = [self._create_subnet_db(context, s)
+                          for s in subnets['subnets']]
+            task.create_tasks(context, task.CREATE, task.SUBNET, sn_entries)
+
+        def _rollback(context, ex):
+            LOG.error(_LE("Failed to create bulk subnets %(subnets)s in "
+                          "Midonet: %(err)s"),
+                      {"subnets": sn_entries, "err": ex})
+            for sn_entry in sn_entries:
+                super(MidonetMixin, self).delete_subnet(context,
+                                                        sn_entry['id'])
+
+        self._dispatch_bulk(context, sn_entries, lambda s: s['network_id'],
+                            'create_subnet', delete_method='delete_subnet',
+                            on_error=_rollback)
+
+        LOG.info(_LI("MidonetMixin.create_subnet_bulk exiting: "
+                     "sn_entries=%r"), sn_entries)
+        return sn_entries
+
     @util.handle_api_error
     def delete_subnet(self, context, id):
         """Delete Neutron subnet.
@@ -240,10 +494,11 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         LOG.info(_LI("MidonetMixin.delete_subnet called: id=%s"), id)
 
         with context.session.begin(subtransactions=True):
+            network_id = self._get_subnet(context, id)['network_id']
             super(MidonetMixin, self).delete_subnet(context, id)
             task.create_task(context, task.DELETE, data_type=task.SUBNET,
                              resource_id=id)
-            self.api_cli.delete_subnet(id)
+            self._dispatch(context, network_id, 'delete_subnet', id)
 
         LOG.info(_LI("MidonetMixin.delete_subnet exiting"))
 
@@ -257,18 +512,16 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             s = super(MidonetMixin, self).update_subnet(context, id, subnet)
             task.create_task(context, task.UPDATE, data_type=task.SUBNET,
                              resource_id=id, data=s)
-            self.api_cli.update_subnet(id, s)
+            self._dispatch(context, s['network_id'], 'update_subnet', id, s)
 
         return s
 
-    def _process_create_port(self, context, port):
+    def _create_port_db(self, context, port):
         """Create a L2 port in Neutron/MidoNet."""
         port_data = port['port']
         with context.session.begin(subtransactions=True):
             # Create a Neutron port
             new_port = super(MidonetMixin, self).create_port(context, port)
-            task.create_task(context, task.CREATE, data_type=task.PORT,
-                             resource_id=new_port['id'], data=new_port)
 
             # Make sure that the port created is valid
             if "id" not in new_port:
@@ -289,32 +542,74 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         return new_port
 
     @util.handle_api_error
-    @utils.synchronized('midonet-port-lock', external=True)
+    @util.synchronized_on('midonet-port-lock',
+                          lambda self, context, port:
+                          port['port']['network_id'])
     def create_port(self, context, port):
         """Create a L2 port in Neutron/MidoNet."""
         LOG.info(_LI("MidonetMixin.create_port called: port=%r"), port)
 
-        new_port = self._process_create_port(context, port)
+        with context.session.begin(subtransactions=True):
+            new_port = self._create_port_db(context, port)
+            task.create_task(context, task.CREATE, data_type=task.PORT,
+                             resource_id=new_port['id'], data=new_port)
 
-        try:
-            self.api_cli.create_port(new_port)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create a port %(new_port)s: %(err)s"),
                       {"new_port": new_port, "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_port(context,
-                                                      new_port['id'])
+            super(MidonetMixin, self).delete_port(context, new_port['id'])
+
+        self._dispatch(context, new_port['network_id'], 'create_port',
+                       new_port, on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_port exiting: port=%r"), new_port)
         return new_port
 
     @util.handle_api_error
-    @utils.synchronized('midonet-port-lock', external=True)
-    @util.retry_on_error(2, 1, db_exc.DBError)
-    def _process_port_delete(self, context, id):
+    def create_port_bulk(self, context, ports):
+        """Create multiple L2 ports in Neutron/MidoNet.
+
+        All the ports are created in one transaction, holding the port locks
+        of all their networks, and journaled with a single insert.  The
+        MidoNet client has no bulk port API, so they are then created in
+        MidoNet one by one.  If any of them fails, all the ports are deleted
+        from MidoNet and Neutron again.
+        """
+        LOG.info(_LI("MidonetMixin.create_port_bulk called: ports=%r"), ports)
+
+        items = ports['ports']
+        lock_names = ['midonet-port-lock-%s' % p['port']['network_id']
+                      for p in items]
+        with lock.lock_all(lock_names):
+            with context.session.begin(subtransactions=True):
+                new_ports = [self._create_port_db(context, p)
+                             for p in items]
+                task.create_tasks(context, task.CREATE, task.PORT, new_ports)
+
+            def _rollback(context, ex):
+                LOG.error(_LE("Failed to create bulk ports %(ports)s: "
+                              "%(err)s"), {"ports": new_ports, "err": ex})
+                for new_port in new_ports:
+                    super(MidonetMixin, self).delete_port(context,
+                                                          new_port['id'])
+
+            self._dispatch_bulk(context, new_ports,
+                                lambda p: p['network_id'], 'create_port',
+                                delete_method='delete_port',
+                                on_error=_rollback)
+
+        LOG.info(_LI("MidonetMixin.create_port_bulk exiting: ports=%r"),
+                 new_ports)
+        return new_ports
+
+    @util.handle_api_error
+    @util.synchronized_on('midonet-port-lock',
+                          lambda self, context, id, network_id: network_id)
+    @util.retry_on_db_conflict()
+    def _process_port_delete(self, context, id, network_id):
         """Delete the Neutron and MidoNet ports
 
-        This method is wrapped by 'retry_on_error' decorator.  See the
+        This method is wrapped by 'retry_on_db_conflict' decorator.  See the
         explanation in the 'delete_network' comment.
         """
         with context.session.begin(subtransactions=True):
@@ -323,7 +618,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             super(MidonetMixin, self).delete_port(context, id)
             task.create_task(context, task.DELETE, data_type=task.PORT,
                              resource_id=id)
-            self.api_cli.delete_port(id)
+            self._dispatch(context, network_id, 'delete_port', id)
 
     def delete_port(self, context, id, l3_port_check=True):
         """Delete a neutron port and corresponding MidoNet bridge port."""
@@ -336,7 +631,9 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         if l3_port_check:
             self.prevent_l3_port_deletion(context, id)
 
-        self._process_port_delete(context, id)
+        # The port lock is per network, so look the network up first.
+        network_id = self._get_port(context, id)['network_id']
+        self._process_port_delete(context, id, network_id)
         LOG.info(_LI("MidonetMixin.delete_port exiting: id=%r"), id)
 
     def _process_port_update(self, context, id, in_port, out_port):
@@ -344,11 +641,29 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         has_sg = self._check_update_has_security_groups(in_port)
         delete_sg = self._check_update_deletes_security_groups(in_port)
 
-        if delete_sg or has_sg:
-            # delete the port binding and read it with the new rules.
-            self._delete_port_security_group_bindings(context, id)
-            sg_ids = self._get_security_groups_on_port(context, in_port)
-            self._process_port_create_security_group(context, out_port, sg_ids)
+        if not (delete_sg or has_sg):
+            return
+
+        # Only add and remove the bindings that changed.
+        sg_ids = list(self._get_security_groups_on_port(context, in_port) or
+                      [])
+        binding_model = securitygroups_db.SecurityGroupPortBinding
+        with context.session.begin(subtransactions=True):
+            bindings = context.session.query(binding_model).filter_by(
+                port_id=id)
+            bound_ids = set(row.security_group_id for row in
+                            bindings.with_entities(
+                                binding_model.security_group_id))
+            removed_ids = bound_ids - set(sg_ids)
+            if removed_ids:
+                bindings.filter(binding_model.security_group_id.in_(
+                    removed_ids)).delete(synchronize_session=False)
+            for sg_id in sg_ids:
+                if sg_id not in bound_ids:
+                    self._create_port_security_group_binding(context, id,
+                                                             sg_id)
+                    bound_ids.add(sg_id)
+        out_port[ext_sg.SECURITYGROUPS] = sg_ids
 
     @util.handle_api_error
     def update_port(self, context, id, port):
@@ -356,16 +671,20 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         LOG.info(_LI("MidonetMixin.update_port called: id=%(id)s "
                      "port=%(port)r"), {'id': id, 'port': port})
         with context.session.begin(subtransactions=True):
+            original = self.get_port(context, id)
 
             # update the port DB
             p = super(MidonetMixin, self).update_port(context, id, port)
-            task.create_task(context, task.UPDATE, data_type=task.PORT,
-                             resource_id=id, data=p)
 
             self._process_port_update(context, id, port, p)
             self._process_portbindings_create_and_update(context,
                                                          port['port'], p)
-            self.api_cli.update_port(id, p)
+
+            if not self._is_noop_update('port', original, p):
+                task.create_task(context, task.UPDATE, data_type=task.PORT,
+                                 resource_id=id, data=p)
+                self._dispatch(context, p['network_id'], 'update_port', id,
+                               p)
 
         LOG.info(_LI("MidonetMixin.update_port exiting: p=%r"), p)
         return p
@@ -387,13 +706,13 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         task.create_task(context, task.CREATE, data_type=task.ROUTER,
                          resource_id=r['id'], data=r)
 
-        try:
-            self.api_cli.create_router(r)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create a router %(r_id)s in Midonet:"
                           "%(err)s"), {"r_id": r["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_router(context, r['id'])
+            super(MidonetMixin, self).delete_router(context, r['id'])
+
+        self._dispatch(context, r['id'], 'create_router', r,
+                       on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_router exiting: "
                      "router=%(router)s."), {"router": r})
@@ -409,7 +728,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             r = super(MidonetMixin, self).update_router(context, id, router)
             task.create_task(context, task.UPDATE, data_type=task.ROUTER,
                              resource_id=id, data=r)
-            self.api_cli.update_router(id, r)
+            self._dispatch(context, id, 'update_router', id, r)
 
         LOG.info(_LI("MidonetMixin.update_router exiting: router=%r"), r)
         return r
@@ -429,7 +748,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             super(MidonetMixin, self).delete_router(context, id)
             task.create_task(context, task.DELETE, data_type=task.ROUTER,
                              resource_id=id)
-            self.api_cli.delete_router(id)
+            self._dispatch(context, id, 'delete_router', id)
 
         LOG.info(_LI("MidonetMixin.delete_router exiting: id=%s"), id)
 
@@ -441,17 +760,24 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                      "interface_info=%(interface_info)r"),
                  {'router_id': router_id, 'interface_info': interface_info})
 
-        info = super(MidonetMixin, self).add_router_interface(
-            context, router_id, interface_info)
+        with context.session.begin(subtransactions=True):
+            info = super(MidonetMixin, self).add_router_interface(
+                context, router_id, interface_info)
+            if self.journal_only:
+                task.create_task(context, task.CREATE,
+                                 data_type=task.ROUTER_INTERFACE,
+                                 resource_id=router_id, data=info)
 
-        try:
-            self.api_cli.add_router_interface(router_id, info)
-        except Exception:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create MidoNet resources to add router "
                           "interface. info=%(info)s, router_id=%(router_id)s"),
                       {"info": info, "router_id": router_id})
-            with excutils.save_and_reraise_exception():
-                self.remove_router_interface(context, router_id, info)
+            self.remove_router_interface(context, router_id, info)
+
+        self._dispatch(context,
+                       self._router_interface_key(context, router_id, info),
+                       'add_router_interface', router_id, info,
+                       on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.add_router_interface exiting: info=%r"),
                  info)
@@ -468,7 +794,15 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             info = super(MidonetMixin, self).remove_router_interface(
                 context, router_id, interface_info)
-            self.api_cli.remove_router_interface(router_id, interface_info)
+            if self.journal_only:
+                task.create_task(context, task.DELETE,
+                                 data_type=task.ROUTER_INTERFACE,
+                                 resource_id=router_id, data=info)
+            self._dispatch(context,
+                           self._router_interface_key(context, router_id,
+                                                      info),
+                           'remove_router_interface', router_id,
+                           interface_info)
 
         LOG.info(_LI("MidonetMixin.remove_router_interface exiting: "
                      "info=%r"), info)
@@ -485,14 +819,14 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         task.create_task(context, task.CREATE, data_type=task.FLOATING_IP,
                          resource_id=fip['id'], data=fip)
 
-        try:
-            self.api_cli.create_floating_ip(fip)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create floating ip %(fip)s: %(err)s"),
                       {"fip": fip, "err": ex})
-            with excutils.save_and_reraise_exception():
-                # Try removing the fip
-                self.delete_floatingip(context, fip['id'])
+            # Try removing the fip
+            self.delete_floatingip(context, fip['id'])
+
+        self._dispatch(context, (fip['id'], fip.get('router_id')),
+                       'create_floating_ip', fip, on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_floatingip exiting: fip=%r"),
                  fip)
@@ -507,7 +841,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             super(MidonetMixin, self).delete_floatingip(context, id)
             task.create_task(context, task.DELETE,
                              data_type=task.FLOATING_IP, resource_id=id)
-            self.api_cli.delete_floating_ip(id)
+            self._dispatch(context, id, 'delete_floating_ip', id)
 
         LOG.info(_LI("MidonetMixin.delete_floatingip exiting: id=%r"), id)
 
@@ -521,18 +855,19 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             fip = super(MidonetMixin, self).update_floatingip(context, id,
                                                               floatingip)
-            task.create_task(context, task.UPDATE,
-                             data_type=task.FLOATING_IP, resource_id=id,
-                             data=fip)
 
             # Update status based on association
             if fip.get('port_id') is None:
                 fip['status'] = n_const.FLOATINGIP_STATUS_DOWN
             else:
                 fip['status'] = n_const.FLOATINGIP_STATUS_ACTIVE
-            self.update_floatingip_status(context, id, fip['status'])
+            self._set_status(context, l3_db.FloatingIP, fip)
 
-            self.api_cli.update_floating_ip(id, fip)
+            task.create_task(context, task.UPDATE,
+                             data_type=task.FLOATING_IP, resource_id=id,
+                             data=fip)
+            self._dispatch(context, (id, fip.get('router_id')),
+                           'update_floating_ip', id, fip)
 
         LOG.info(_LI("MidonetMixin.update_floating_ip exiting: fip=%s"), fip)
         return fip
@@ -553,7 +888,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         sg = security_group.get('security_group')
         tenant_id = self._get_tenant_id_for_create(context, sg)
         if not default_sg:
-            self._ensure_default_security_group(context, tenant_id)
+            self._ensure_default_security_group_cached(context, tenant_id)
 
         # Create the Neutron sg first
         sg = super(MidonetMixin, self).create_security_group(
@@ -561,15 +896,15 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         task.create_task(context, task.CREATE, data_type=task.SECURITY_GROUP,
                          resource_id=sg['id'], data=sg)
 
-        try:
-            # Process the MidoNet side
-            self.api_cli.create_security_group(sg)
-        except Exception:
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create MidoNet resources for sg %(sg)r"),
                       {"sg": sg})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_security_group(context,
-                                                                sg['id'])
+            super(MidonetMixin, self).delete_security_group(context,
+                                                            sg['id'])
+
+        # Process the MidoNet side
+        self._dispatch(context, sg['id'], 'create_security_group', sg,
+                       on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_security_group exiting: sg=%r"), sg)
         return sg
@@ -591,7 +926,10 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             task.create_task(context, task.DELETE,
                              data_type=task.SECURITY_GROUP, resource_id=id)
 
-            self.api_cli.delete_security_group(id)
+            self._dispatch(context, id, 'delete_security_group', id)
+
+        if self._default_sg_ids.get(sg['tenant_id']) == id:
+            self._default_sg_ids.pop(sg['tenant_id'], None)
 
         LOG.info(_LI("MidonetMixin.delete_security_group exiting: id=%r"), id)
 
@@ -606,20 +944,21 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                      "security_group_rule=%(security_group_rule)r"),
                  {'security_group_rule': security_group_rule})
 
-        rule = super(MidonetMixin, self).create_security_group_rule(
-            context, security_group_rule)
-        task.create_task(context, task.CREATE,
-                         data_type=task.SECURITY_GROUP_RULE,
-                         resource_id=rule['id'], data=rule)
+        with context.session.begin(subtransactions=True):
+            rule = super(MidonetMixin, self).create_security_group_rule(
+                context, security_group_rule)
+            task.create_task(context, task.CREATE,
+                             data_type=task.SECURITY_GROUP_RULE,
+                             resource_id=rule['id'], data=rule)
 
-        try:
-            self.api_cli.create_security_group_rule(rule)
-        except Exception as ex:
+        def _rollback(context, ex):
             LOG.error(_LE('Failed to create security group rule %(sg)s,'
                       'error: %(err)s'), {'sg': rule, 'err': ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetMixin, self).delete_security_group_rule(
-                    context, rule['id'])
+            super(MidonetMixin, self).delete_security_group_rule(
+                context, rule['id'])
+
+        self._dispatch(context, rule['security_group_id'],
+                       'create_security_group_rule', rule, on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_security_group_rule exiting: "
                      "rule=%r"), rule)
@@ -636,19 +975,27 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                      "security_group_rules=%(security_group_rules)r"),
                  {'security_group_rules': security_group_rules})
 
-        rules = super(
-            MidonetMixin,
-            self).create_security_group_rule_bulk_native(context,
-                                                         security_group_rules)
-        try:
-            self.api_cli.create_security_group_rule_bulk(rules)
-        except Exception as ex:
+        # The rules and their tasks are inserted in one transaction, so that
+        # the journal never misses rules that were created.
+        with context.session.begin(subtransactions=True):
+            rules = super(
+                MidonetMixin,
+                self).create_security_group_rule_bulk_native(
+                    context, security_group_rules)
+            task.create_tasks(context, task.CREATE,
+                              task.SECURITY_GROUP_RULE, rules)
+
+        def _rollback(context, ex):
             LOG.error(_LE("Failed to create bulk security group rules %(sg)s, "
                           "error: %(err)s"), {"sg": rules, "err": ex})
-            with excutils.save_and_reraise_exception():
-                for rule in rules:
-                    super(MidonetMixin, self).delete_security_group_rule(
-                        context, rule['id'])
+            for rule in rules:
+                super(MidonetMixin, self).delete_security_group_rule(
+                    context, rule['id'])
+
+        self._dispatch_bulk(context, rules, lambda r: r['security_group_id'],
+                            'create_security_group_rule',
+                            bulk_method='create_security_group_rule_bulk',
+                            on_error=_rollback)
 
         LOG.info(_LI("MidonetMixin.create_security_group_rule_bulk exiting: "
                      "rules=%r"), rules)
@@ -665,28 +1012,43 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                      "sg_rule_id=%s"), sg_rule_id)
 
         with context.session.begin(subtransactions=True):
+            sg_id = self._get_security_group_rule(
+                context, sg_rule_id)['security_group_id']
             super(MidonetMixin, self).delete_security_group_rule(context,
                                                                  sg_rule_id)
             task.create_task(context, task.DELETE,
                              data_type=task.SECURITY_GROUP_RULE,
                              resource_id=sg_rule_id)
-            self.api_cli.delete_security_group_rule(sg_rule_id)
+            self._dispatch(context, sg_id, 'delete_security_group_rule',
+                           sg_rule_id)
 
         LOG.info(_LI("MidonetMixin.delete_security_group_rule exiting: "
                      "id=%r"), id)
 
+    def _set_status(self, context, model, resource):
+        """Set the status of a resource just created or updated.
+
+        The status is set on the object of the session rather than with
+        update_status, so that it is written by the pending INSERT or UPDATE
+        of the resource instead of a separate UPDATE.
+        """
+        db_util.get_session_object(context, model, resource['id']).status = (
+            resource['status'])
+
     def _validate_vip_subnet(self, context, subnet_id, pool_id):
         # ensure that if the vip subnet is public, the router has its
         # gateway set.
-        subnet = self._get_subnet(context, subnet_id)
-        if db_util.is_subnet_external(context, subnet):
-            router_id = db_util.get_router_from_pool(context, pool_id)
-            # router_id should never be None because it was already validated
+        subnet_router = db_util.get_subnet_router(context, subnet_id)
+        if subnet_router is None:
+            raise n_exc.SubnetNotFound(subnet_id=subnet_id)
+        external, _router_id = subnet_router
+        if external:
+            router = db_util.get_pool_router(context, pool_id)
+            # router should never be None because it was already validated
             # when we created the pool
-            assert router_id is not None
+            assert router is not None
 
-            router = self._get_router(context, router_id)
-            if router.get('gw_port_id') is None:
+            if router.gw_port_id is None:
                 msg = _("The router must have its gateway set if the "
                         "VIP subnet is external")
                 raise n_exc.BadRequest(resource='router', msg=msg)
@@ -702,12 +1064,11 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                                       vip['vip']['pool_id'])
 
             v = super(MidonetMixin, self).create_vip(context, vip)
+            v['status'] = constants.ACTIVE
+            self._set_status(context, loadbalancer_db.Vip, v)
             task.create_task(context, task.CREATE, data_type=task.VIP,
                              resource_id=v['id'], data=v)
-            self.api_cli.create_vip(v)
-            v['status'] = constants.ACTIVE
-            self.update_status(context, loadbalancer_db.Vip, v['id'],
-                               v['status'])
+            self._dispatch(context, (v['id'], v['pool_id']), 'create_vip', v)
 
         LOG.debug("MidonetMixin.create_vip exiting: id=%r", v['id'])
         return v
@@ -718,10 +1079,11 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                   {'id': id})
 
         with context.session.begin(subtransactions=True):
+            pool_id = self.get_vip(context, id)['pool_id']
             super(MidonetMixin, self).delete_vip(context, id)
             task.create_task(context, task.DELETE, data_type=task.VIP,
                              resource_id=id)
-            self.api_cli.delete_vip(id)
+            self._dispatch(context, (id, pool_id), 'delete_vip', id)
 
         LOG.debug("MidonetMixin.delete_vip existing: id=%(id)r",
                   {'id': id})
@@ -735,7 +1097,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             v = super(MidonetMixin, self).update_vip(context, id, vip)
             task.create_task(context, task.UPDATE, data_type=task.VIP,
                              resource_id=id, data=v)
-            self.api_cli.update_vip(id, v)
+            self._dispatch(context, (id, v['pool_id']), 'update_vip', id, v)
 
         LOG.debug("MidonetMixin.update_vip exiting: id=%(id)r, "
                   "vip=%(vip)r", {'id': id, 'vip': v})
@@ -746,13 +1108,15 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         LOG.debug("MidonetMixin.create_pool called: %(pool)r",
                   {'pool': pool})
 
-        subnet = db_util.get_subnet(context, pool['pool']['subnet_id'])
-        if db_util.is_subnet_external(context, subnet):
+        subnet_id = pool['pool']['subnet_id']
+        subnet_router = db_util.get_subnet_router(context, subnet_id)
+        if subnet_router is None:
+            raise n_exc.SubnetNotFound(subnet_id=subnet_id)
+        external, router_id = subnet_router
+        if external:
             msg = _("pool subnet must not be public")
             raise n_exc.BadRequest(resource='subnet', msg=msg)
 
-        router_id = db_util.get_router_from_subnet(context, subnet)
-
         if not router_id:
             msg = _("pool subnet must be associated with router")
             raise n_exc.BadRequest(resource='router', msg=msg)
@@ -766,6 +1130,8 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
 
         with context.session.begin(subtransactions=True):
             p = super(MidonetMixin, self).create_pool(context, pool)
+            p['status'] = constants.ACTIVE
+            self._set_status(context, loadbalancer_db.Pool, p)
             task.create_task(context, task.CREATE, data_type=task.POOL,
                              resource_id=p['id'], data=p)
             res = {
@@ -776,16 +1142,24 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                                                     loadbalancer_db.Pool)
             p[rsi.ROUTER_ID] = router_id
 
-            self.api_cli.create_pool(p)
-
-            p['status'] = constants.ACTIVE
-            self.update_status(context, loadbalancer_db.Pool, p['id'],
-                               p['status'])
+            self._dispatch(context, (p['id'], router_id), 'create_pool', p)
 
         LOG.debug("MidonetMixin.create_pool exiting: %(pool)r",
                   {'pool': p})
         return p
 
+    def get_pool(self, context, id, fields=None):
+        pool = super(MidonetMixin, self).get_pool(context, id)
+        self._extend_resource_router_id_dict(context, pool,
+                                             loadbalancer_db.Pool)
+        return self._fields(pool, fields)
+
+    def get_pools(self, context, filters=None, fields=None):
+        pools = super(MidonetMixin, self).get_pools(context, filters=filters)
+        self._extend_resource_router_id_dicts(context, pools,
+                                              loadbalancer_db.Pool)
+        return [self._fields(pool, fields) for pool in pools]
+
     @util.handle_api_error
     def update_pool(self, context, id, pool):
         LOG.debug("MidonetMixin.update_pool called: id=%(id)r, "
@@ -795,7 +1169,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             p = super(MidonetMixin, self).update_pool(context, id, pool)
             task.create_task(context, task.UPDATE, data_type=task.POOL,
                              resource_id=id, data=p)
-            self.api_cli.update_pool(id, p)
+            self._dispatch(context, id, 'update_pool', id, p)
 
         LOG.debug("MidonetMixin.update_pool exiting: id=%(id)r, "
                   "pool=%(pool)r", {'id': id, 'pool': pool})
@@ -806,12 +1180,15 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         LOG.debug("MidonetMixin.delete_pool called: %(id)r", {'id': id})
 
         with context.session.begin(subtransactions=True):
+            binding = self._get_resource_router_id_binding(
+                context, loadbalancer_db.Pool, resource_id=id)
+            router_id = binding.router_id if binding else None
             self._delete_resource_router_id_binding(context, id,
                                                     loadbalancer_db.Pool)
             super(MidonetMixin, self).delete_pool(context, id)
             task.create_task(context, task.DELETE, data_type=task.POOL,
                              resource_id=id)
-            self.api_cli.delete_pool(id)
+            self._dispatch(context, (id, router_id), 'delete_pool', id)
 
         LOG.debug("MidonetMixin.delete_pool exiting: %(id)r", {'id': id})
 
@@ -822,12 +1199,12 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
 
         with context.session.begin(subtransactions=True):
             m = super(MidonetMixin, self).create_member(context, member)
+            m['status'] = constants.ACTIVE
+            self._set_status(context, loadbalancer_db.Member, m)
             task.create_task(context, task.CREATE, data_type=task.MEMBER,
                              resource_id=m['id'], data=m)
-            self.api_cli.create_member(m)
-            m['status'] = constants.ACTIVE
-            self.update_status(context, loadbalancer_db.Member, m['id'],
-                               m['status'])
+            self._dispatch(context, (m['id'], m['pool_id']), 'create_member',
+                           m)
 
         LOG.debug("MidonetMixin.create_member exiting: %(member)r",
                   {'member': m})
@@ -842,7 +1219,8 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             m = super(MidonetMixin, self).update_member(context, id, member)
             task.create_task(context, task.UPDATE, data_type=task.MEMBER,
                              resource_id=id, data=m)
-            self.api_cli.update_member(id, m)
+            self._dispatch(context, (id, m['pool_id']), 'update_member', id,
+                           m)
 
         LOG.debug("MidonetMixin.update_member exiting: id=%(id)r, "
                   "member=%(member)r", {'id': id, 'member': m})
@@ -854,10 +1232,11 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
                   {'id': id})
 
         with context.session.begin(subtransactions=True):
+            pool_id = self.get_member(context, id)['pool_id']
             super(MidonetMixin, self).delete_member(context, id)
             task.create_task(context, task.DELETE,
                              data_type=task.MEMBER, resource_id=id)
-            self.api_cli.delete_member(id)
+            self._dispatch(context, (id, pool_id), 'delete_member', id)
 
         LOG.debug("MidonetMixin.delete_member exiting: %(id)r",
                   {'id': id})
@@ -873,7 +1252,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             task.create_task(context, task.CREATE,
                              data_type=task.HEALTH_MONITOR,
                              resource_id=hm['id'], data=hm)
-            self.api_cli.create_health_monitor(hm)
+            self._dispatch(context, hm['id'], 'create_health_monitor', hm)
 
         LOG.debug("MidonetMixin.create_health_monitor exiting: "
                   "%(health_monitor)r", {'health_monitor': hm})
@@ -891,7 +1270,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             task.create_task(context, task.UPDATE,
                              data_type=task.HEALTH_MONITOR,
                              resource_id=id, data=hm)
-            self.api_cli.update_health_monitor(id, hm)
+            self._dispatch(context, id, 'update_health_monitor', id, hm)
 
         LOG.debug("MidonetMixin.update_health_monitor exiting: id=%(id)r, "
                   "health_monitor=%(health_monitor)r",
@@ -907,7 +1286,7 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
             super(MidonetMixin, self).delete_health_monitor(context, id)
             task.create_task(context, task.DELETE,
                              data_type=task.HEALTH_MONITOR, resource_id=id)
-            self.api_cli.delete_health_monitor(id)
+            self._dispatch(context, id, 'delete_health_monitor', id)
 
         LOG.debug("MidonetMixin.delete_health_monitor exiting: %(id)r",
                   {'id': id})
@@ -928,7 +1307,13 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             monitors = super(MidonetMixin, self).create_pool_health_monitor(
                 context, health_monitor, pool_id)
-            self.api_cli.create_pool_health_monitor(hm, pool_id)
+            if self.journal_only:
+                task.create_task(context, task.CREATE,
+                                 data_type=task.POOL_HEALTH_MONITOR,
+                                 resource_id=hm['id'],
+                                 data={'id': hm['id'], 'pool_id': pool_id})
+            self._dispatch(context, (pool_id, hm['id']),
+                           'create_pool_health_monitor', hm, pool_id)
 
         LOG.debug("MidonetMixin.create_pool_health_monitor exiting: "
                   "%(health_monitor)r, %(pool_id)r",
@@ -944,7 +1329,13 @@ class MidonetMixin(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             super(MidonetMixin, self).delete_pool_health_monitor(
                 context, id, pool_id)
-            self.api_cli.delete_pool_health_monitor(id, pool_id)
+            if self.journal_only:
+                task.create_task(context, task.DELETE,
+                                 data_type=task.POOL_HEALTH_MONITOR,
+                                 resource_id=id,
+                                 data={'id': id, 'pool_id': pool_id})
+            self._dispatch(context, (pool_id, id),
+                           'delete_pool_health_monitor', id, pool_id)
 
         LOG.debug("MidonetMixin.delete_pool_health_monitor exiting: "
                   "%(id)r, %(pool_id)r", {'id': id, 'pool_id': pool_id})
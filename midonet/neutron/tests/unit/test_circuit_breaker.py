@@ -0,0 +1,92 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from webob import exc as w_exc
+
+from neutron.tests import base
+
+from midonet.neutron.common import circuit_breaker as cb
+
+
+class CircuitBreakerTestCase(base.BaseTestCase):
+    """Test for midonet.neutron.common.circuit_breaker."""
+
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.breaker = cb.CircuitBreaker(2, 30)
+        self.now = 1000.0
+        patcher = mock.patch.object(cb.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fail(self, error=None):
+        raise error or w_exc.HTTPServiceUnavailable()
+
+    def _open(self):
+        for i in range(2):
+            self.assertRaises(w_exc.HTTPServiceUnavailable, self.breaker.call,
+                              self._fail)
+
+    def test_opens_after_threshold(self):
+        self._open()
+
+        self.assertEqual(cb.OPEN, self.breaker.state)
+        func = mock.Mock()
+        self.assertRaises(cb.CircuitOpen, self.breaker.call, func)
+        self.assertFalse(func.called)
+
+    def test_client_errors_do_not_count(self):
+        for i in range(3):
+            self.assertRaises(w_exc.HTTPNotFound, self.breaker.call,
+                              self._fail, w_exc.HTTPNotFound())
+
+        self.assertEqual(cb.CLOSED, self.breaker.state)
+        self.assertEqual(0, self.breaker.failure_count)
+
+    def test_half_open_probe_closes(self):
+        self._open()
+        self.now += 30
+
+        self.assertEqual(cb.HALF_OPEN, self.breaker.state)
+        self.assertEqual('foo', self.breaker.call(lambda: 'foo'))
+        self.assertEqual(cb.CLOSED, self.breaker.state)
+        self.assertEqual(0, self.breaker.failure_count)
+
+    def test_half_open_probe_reopens(self):
+        self._open()
+        self.now += 30
+
+        self.assertRaises(w_exc.HTTPServiceUnavailable, self.breaker.call,
+                          self._fail)
+
+        self.assertEqual(cb.OPEN, self.breaker.state)
+
+    def test_half_open_single_probe(self):
+        self._open()
+        self.now += 30
+
+        def _probe():
+            self.assertRaises(cb.CircuitOpen, self.breaker.call, mock.Mock())
+
+        self.breaker.call(_probe)
+
+    def test_disabled(self):
+        breaker = cb.CircuitBreaker(0, 30)
+        for i in range(3):
+            self.assertRaises(w_exc.HTTPServiceUnavailable, breaker.call,
+                              self._fail)
+
+        self.assertEqual(cb.CLOSED, breaker.state)
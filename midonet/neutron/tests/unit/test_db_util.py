@@ -0,0 +1,182 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.common import constants as n_const
+from neutron import context
+from neutron.db import external_net_db
+from neutron.db import l3_db
+from neutron.db import models_v2
+from neutron.tests.unit import testlib_api
+from neutron_lbaas.db.loadbalancer import loadbalancer_db as lb_db
+
+from midonet.neutron.db import db_util
+from midonet.neutron.db import task
+
+
+class DbUtilTestCase(testlib_api.SqlTestCase):
+    """Test for midonet.neutron.db.db_util."""
+
+    def setUp(self):
+        super(DbUtilTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        task.create_task(self.ctx, task.CREATE, data_type=task.NETWORK,
+                         resource_id='foo', data={'id': 'foo'})
+        self.task_id = self.ctx.session.query(task.Task.id).scalar()
+
+    def test_lookup_is_cached(self):
+        with self.ctx.session.begin():
+            t = db_util.get_by_model_id(self.ctx, task.Task, self.task_id)
+            self.ctx.session.expunge(t)
+
+            self.assertIs(t, db_util.get_by_model_id(self.ctx, task.Task,
+                                                     self.task_id))
+
+    def test_cache_cleared_on_flush(self):
+        with self.ctx.session.begin():
+            t = db_util.get_by_model_id(self.ctx, task.Task, self.task_id)
+            self.ctx.session.delete(t)
+            self.ctx.session.flush()
+
+            self.assertIsNone(db_util.get_by_model_id(self.ctx, task.Task,
+                                                      self.task_id))
+
+    def test_cache_cleared_on_commit(self):
+        with self.ctx.session.begin():
+            t = db_util.get_by_model_id(self.ctx, task.Task, self.task_id)
+            self.ctx.session.expunge(t)
+
+        self.assertIsNot(t, db_util.get_by_model_id(self.ctx, task.Task,
+                                                    self.task_id))
+
+    def test_get_session_object_pending(self):
+        with self.ctx.session.begin():
+            t = task.Task(id=self.task_id + 1, type=task.CREATE)
+            self.ctx.session.add(t)
+
+            self.assertIs(t, db_util.get_session_object(
+                self.ctx, task.Task, self.task_id + 1))
+            self.assertIn(t, self.ctx.session.new)
+
+    def test_get_session_object_persistent(self):
+        with self.ctx.session.begin():
+            t = self.ctx.session.query(task.Task).get(self.task_id)
+
+            self.assertIs(t, db_util.get_session_object(self.ctx, task.Task,
+                                                        self.task_id))
+
+    def test_cache_after_commit_without_transaction(self):
+        cache = {}
+
+        db_util.cache_after_commit(self.ctx.session, cache, 'foo', 'bar')
+
+        self.assertEqual({'foo': 'bar'}, cache)
+
+    def test_cache_after_commit(self):
+        cache = {}
+        with self.ctx.session.begin():
+            db_util.cache_after_commit(self.ctx.session, cache, 'foo', 'bar')
+            self.assertEqual({}, cache)
+
+        self.assertEqual({'foo': 'bar'}, cache)
+
+    def test_cache_after_commit_rolled_back(self):
+        cache = {}
+        try:
+            with self.ctx.session.begin():
+                db_util.cache_after_commit(self.ctx.session, cache, 'foo',
+                                           'bar')
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual({}, cache)
+
+
+class SubnetRouterTestCase(testlib_api.SqlTestCase):
+    """Test for the subnet and pool router lookups of db_util."""
+
+    def setUp(self):
+        super(SubnetRouterTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        with self.ctx.session.begin():
+            self._add_subnet('net', 'subnet', '10.0.0.0/24', '10.0.0.1')
+            self.ctx.session.add(l3_db.Router(
+                id='router', tenant_id='tenant', name='router',
+                status='ACTIVE', admin_state_up=True))
+            self._add_port('net', 'port', 'subnet', '10.0.0.1', 'router',
+                           n_const.DEVICE_OWNER_ROUTER_INTF)
+            self.ctx.session.add(l3_db.RouterPort(
+                router_id='router', port_id='port',
+                port_type=n_const.DEVICE_OWNER_ROUTER_INTF))
+            self.ctx.session.add(lb_db.Pool(
+                id='pool', tenant_id='tenant', name='pool',
+                subnet_id='subnet', protocol='HTTP',
+                lb_method='ROUND_ROBIN', status='ACTIVE',
+                admin_state_up=True))
+
+    def _add_subnet(self, network_id, subnet_id, cidr, gateway_ip):
+        self.ctx.session.add(models_v2.Network(
+            id=network_id, tenant_id='tenant', name=network_id,
+            status='ACTIVE', admin_state_up=True, shared=False))
+        self.ctx.session.add(models_v2.Subnet(
+            id=subnet_id, tenant_id='tenant', network_id=network_id,
+            ip_version=4, cidr=cidr, gateway_ip=gateway_ip,
+            enable_dhcp=False, shared=False))
+
+    def _add_port(self, network_id, port_id, subnet_id, ip_address,
+                  device_id, device_owner):
+        self.ctx.session.add(models_v2.Port(
+            id=port_id, tenant_id='tenant', network_id=network_id,
+            mac_address='fa:16:3e:00:00:01', admin_state_up=True,
+            status='ACTIVE', device_id=device_id,
+            device_owner=device_owner))
+        self.ctx.session.add(models_v2.IPAllocation(
+            port_id=port_id, ip_address=ip_address, subnet_id=subnet_id,
+            network_id=network_id))
+
+    def test_get_subnet_router(self):
+        self.assertEqual((False, 'router'),
+                         db_util.get_subnet_router(self.ctx, 'subnet'))
+
+    def test_get_subnet_router_external(self):
+        with self.ctx.session.begin():
+            self._add_subnet('ext-net', 'ext-subnet', '172.16.0.0/24',
+                             '172.16.0.1')
+            self.ctx.session.add(external_net_db.ExternalNetwork(
+                network_id='ext-net'))
+
+        self.assertEqual((True, None),
+                         db_util.get_subnet_router(self.ctx, 'ext-subnet'))
+
+    def test_get_subnet_router_without_interface(self):
+        with self.ctx.session.begin():
+            self._add_subnet('net2', 'subnet2', '10.0.1.0/24', '10.0.1.1')
+            # A port on the gateway IP which is not a router interface
+            self._add_port('net2', 'port2', 'subnet2', '10.0.1.1', 'vm',
+                           'compute:nova')
+
+        self.assertEqual((False, None),
+                         db_util.get_subnet_router(self.ctx, 'subnet2'))
+
+    def test_get_subnet_router_missing_subnet(self):
+        self.assertIsNone(db_util.get_subnet_router(self.ctx, 'missing'))
+
+    def test_get_pool_router(self):
+        router = db_util.get_pool_router(self.ctx, 'pool')
+
+        self.assertEqual('router', router.id)
+
+    def test_get_pool_router_missing_pool(self):
+        self.assertIsNone(db_util.get_pool_router(self.ctx, 'missing'))
@@ -0,0 +1,113 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from neutron.tests import base
+
+from midonet.neutron.common import dispatcher
+
+
+class ApiDispatcherTestCase(base.BaseTestCase):
+    """Test for midonet.neutron.common.dispatcher."""
+
+    def setUp(self):
+        super(ApiDispatcherTestCase, self).setUp()
+        self.dispatcher = dispatcher.ApiDispatcher(4)
+        self.calls = []
+        engine = sa.create_engine('sqlite://')
+        self.session = orm.sessionmaker(bind=engine, autocommit=True)()
+
+    def _call(self, name):
+        # Yield so that calls of other keys get a chance to interleave.
+        eventlet.sleep(0)
+        self.calls.append(name)
+
+    def _fail(self):
+        raise ValueError()
+
+    def test_calls_with_same_key_are_ordered(self):
+        for i in range(5):
+            self.dispatcher.submit('foo', self._call, ('foo%d' % i,))
+        self.dispatcher.submit('bar', self._call, ('bar',))
+        self.dispatcher.waitall()
+
+        foo_calls = [c for c in self.calls if c.startswith('foo')]
+        self.assertEqual(['foo%d' % i for i in range(5)], foo_calls)
+        self.assertIn('bar', self.calls)
+
+    def test_calls_sharing_a_key_are_ordered(self):
+        self.dispatcher.submit('net', self._call, ('port',))
+        self.dispatcher.submit('router', self._call, ('router',))
+        self.dispatcher.submit(('router', 'net'), self._call, ('interface',))
+        self.dispatcher.submit('router', self._call, ('route',))
+        self.dispatcher.waitall()
+
+        self.assertLess(self.calls.index('port'),
+                        self.calls.index('interface'))
+        self.assertLess(self.calls.index('router'),
+                        self.calls.index('interface'))
+        self.assertLess(self.calls.index('interface'),
+                        self.calls.index('route'))
+
+    def test_waiting_calls_do_not_exhaust_pool(self):
+        self.dispatcher = dispatcher.ApiDispatcher(1)
+        for i in range(3):
+            self.dispatcher.submit(('foo', 'bar%d' % i), self._call,
+                                   ('foo%d' % i,))
+        self.dispatcher.waitall()
+
+        self.assertEqual(['foo0', 'foo1', 'foo2'], self.calls)
+
+    def test_failure_calls_on_error(self):
+        errors = []
+        self.dispatcher.submit('foo', self._fail, on_error=errors.append)
+        self.dispatcher.submit('foo', self._call, ('foo',))
+        self.dispatcher.waitall()
+
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], ValueError)
+        self.assertEqual(['foo'], self.calls)
+
+    def test_submit_without_transaction(self):
+        self.dispatcher.submit_after_commit(self.session, 'foo', self._call,
+                                            ('foo',))
+        self.dispatcher.waitall()
+
+        self.assertEqual(['foo'], self.calls)
+
+    def test_submit_after_commit(self):
+        with self.session.begin():
+            self.dispatcher.submit_after_commit(self.session, 'foo',
+                                                self._call, ('foo',))
+            self.dispatcher.waitall()
+            self.assertEqual([], self.calls)
+        self.dispatcher.waitall()
+
+        self.assertEqual(['foo'], self.calls)
+
+    def test_submit_after_rollback(self):
+        try:
+            with self.session.begin():
+                self.dispatcher.submit_after_commit(self.session, 'foo',
+                                                    self._call, ('foo',))
+                raise ValueError()
+        except ValueError:
+            pass
+        self.dispatcher.waitall()
+
+        self.assertEqual([], self.calls)
@@ -43,7 +43,10 @@ class SystemTestCase(test_api_v2_extension.ExtensionTestCase):
     def test_get_system_state(self):
         return_value = {'state': 'ACTIVE',
                         'availability': 'READWRITE',
-                        'write_version': '1.0'}
+                        'write_version': '1.0',
+                        'api_circuit_state': 'CLOSED',
+                        'api_failure_count': 0,
+                        'suppressed_updates': {'port': 2}}
 
         instance = self.plugin.return_value
         instance.get_system.return_value = return_value
@@ -56,6 +59,8 @@ class SystemTestCase(test_api_v2_extension.ExtensionTestCase):
 
         res = self.deserialize(res)
         self.assertIn('system', res)
+        self.assertEqual('CLOSED', res['system']['api_circuit_state'])
+        self.assertEqual({'port': 2}, res['system']['suppressed_updates'])
 
     def test_update_system_state(self):
         data = {'system': {'state': 'UPGRADE',
@@ -0,0 +1,62 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.tests import base
+
+from midonet.neutron.common import http_pool
+
+
+class HttpPoolTestCase(base.BaseTestCase):
+    """Test for midonet.neutron.common.http_pool."""
+
+    def setUp(self):
+        super(HttpPoolTestCase, self).setUp()
+        patcher = mock.patch.object(http_pool.httplib2, 'Http')
+        self.http_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.http_class.side_effect = lambda: mock.Mock(connections={})
+        self.pool = http_pool.HttpPool(2, 60)
+        self.httplib2 = http_pool.PooledHttplib2(self.pool)
+
+    def test_http_reused(self):
+        self.httplib2.Http().request('http://foo', 'GET')
+        self.httplib2.Http().request('http://foo', 'GET')
+
+        self.assertEqual(1, self.http_class.call_count)
+
+    def test_idle_connections_closed(self):
+        conn = mock.Mock()
+        with self.pool.http() as http:
+            http.connections['http:foo'] = conn
+
+        with mock.patch.object(http_pool.time, 'time',
+                               return_value=http_pool.time.time() + 61):
+            self.httplib2.Http().request('http://foo', 'GET')
+
+        conn.close.assert_called_once_with()
+        self.assertEqual({}, http.connections)
+
+    def test_connections_closed_on_error(self):
+        conn = mock.Mock()
+        with self.pool.http() as http:
+            http.connections['http:foo'] = conn
+        http.request.side_effect = ValueError()
+
+        self.assertRaises(ValueError, self.httplib2.Http().request,
+                          'http://foo', 'GET')
+
+        conn.close.assert_called_once_with()
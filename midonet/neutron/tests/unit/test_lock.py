@@ -0,0 +1,152 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.tests import base
+
+from midonet.neutron.common import lock
+
+
+class DbLockDriverTestCase(base.BaseTestCase):
+    """Test for midonet.neutron.common.lock.DbLockDriver."""
+
+    def setUp(self):
+        super(DbLockDriverTestCase, self).setUp()
+        self.engine = mock.Mock()
+        self.conn = self.engine.connect.return_value
+        self.conn.dialect.server_version_info = (5, 7, 9)
+        patcher = mock.patch.object(lock.db_api, 'get_engine',
+                                    return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = lock.DbLockDriver()
+
+    def _set_dialect(self, name):
+        self.engine.dialect.name = name
+        self.conn.dialect.name = name
+
+    def _statements(self):
+        return [str(c[0][0]) for c in self.conn.execute.call_args_list]
+
+    def test_mysql_lock(self):
+        self._set_dialect('mysql')
+        self.conn.execute.return_value.scalar.return_value = 1
+
+        with self.driver.lock('foo'):
+            self.assertEqual(["SELECT GET_LOCK(:name, :timeout)"],
+                             self._statements())
+
+        self.assertEqual(["SELECT GET_LOCK(:name, :timeout)",
+                          "SELECT RELEASE_LOCK(:name)"], self._statements())
+        self.conn.close.assert_called_once_with()
+
+    def test_mysql_lock_timeout(self):
+        self._set_dialect('mysql')
+        self.conn.execute.return_value.scalar.return_value = 0
+
+        def _lock():
+            with self.driver.lock('foo'):
+                pass
+
+        self.assertRaises(lock.LockTimeout, _lock)
+        self.conn.close.assert_called_once_with()
+
+    def test_mysql_lock_all_on_one_connection(self):
+        self._set_dialect('mysql')
+        self.conn.execute.return_value.scalar.return_value = 1
+
+        with self.driver.lock_all(['foo', 'bar']):
+            pass
+
+        self.assertEqual(["SELECT GET_LOCK(:name, :timeout)"] * 2 +
+                         ["SELECT RELEASE_LOCK(:name)"] * 2,
+                         self._statements())
+        self.engine.connect.assert_called_once_with()
+        self.conn.close.assert_called_once_with()
+
+    def test_old_mysql_lock_all_on_one_connection_per_lock(self):
+        self._set_dialect('mysql')
+        self.conn.dialect.server_version_info = (5, 6, 20)
+        self.conn.execute.return_value.scalar.return_value = 1
+
+        with self.driver.lock_all(['foo', 'bar']):
+            pass
+
+        self.assertEqual(2, self.engine.connect.call_count)
+        self.assertEqual(2, self.conn.close.call_count)
+
+    def test_lock_all_releases_on_timeout(self):
+        self._set_dialect('mysql')
+        self.conn.execute.return_value.scalar.side_effect = [1, 0, None]
+
+        def _lock():
+            with self.driver.lock_all(['foo', 'bar']):
+                pass
+
+        self.assertRaises(lock.LockTimeout, _lock)
+        self.assertEqual("SELECT RELEASE_LOCK(:name)", self._statements()[-1])
+        self.conn.close.assert_called_once_with()
+
+    def test_postgresql_lock(self):
+        self._set_dialect('postgresql')
+        self.conn.execute.return_value.scalar.side_effect = [False, True]
+
+        with mock.patch.object(lock.time, 'sleep'):
+            with self.driver.lock('foo'):
+                pass
+
+        self.assertEqual(["SELECT pg_try_advisory_lock(:key)"] * 2 +
+                         ["SELECT pg_advisory_unlock(:key)"],
+                         self._statements())
+
+    def test_unsupported_dialect(self):
+        self._set_dialect('sqlite')
+
+        with mock.patch.object(lock.lockutils, 'lock') as file_lock:
+            with self.driver.lock('foo'):
+                pass
+
+        file_lock.assert_called_once_with('foo', lock_file_prefix='neutron-',
+                                          external=True)
+        self.assertFalse(self.engine.connect.called)
+
+
+class LockAllTestCase(base.BaseTestCase):
+    """Test for midonet.neutron.common.lock.lock_all."""
+
+    def test_lock_driver_is_abstract(self):
+        self.assertRaises(TypeError, lock.LockDriver)
+
+    def test_lock_all_sorted(self):
+        names = []
+
+        class _Driver(lock.LockDriver):
+            def lock(self, name):
+                names.append(name)
+                return mock.MagicMock()
+
+        with _Driver().lock_all(['foo', 'bar', 'foo']):
+            pass
+
+        self.assertEqual(['bar', 'foo'], names)
+
+    def test_lock_all_uses_driver(self):
+        driver = mock.MagicMock()
+        with mock.patch.object(lock, 'get_driver', return_value=driver):
+            with lock.lock_all(['foo', 'bar']):
+                pass
+
+        driver.lock_all.assert_called_once_with(['foo', 'bar'])
@@ -16,18 +16,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import mock
 import os
 
+import eventlet
 from oslo_utils import importutils
 
-from midonet.neutron.db import task  # noqa
+from midonet.neutron.common import circuit_breaker
+from midonet.neutron.common import dispatcher
+from midonet.neutron.db import db_util
+from midonet.neutron.db import task
+from midonet.neutron import plugin
+from neutron.db import db_base_plugin_v2
+from neutron.db import l3_gwmode_db
+from neutron.db import securitygroups_db
 from neutron.extensions import portbindings
+from neutron.extensions import securitygroup as ext_sg
+from neutron.tests import base
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 import neutron.tests.unit.test_db_plugin as test_plugin
 import neutron.tests.unit.test_extension_ext_gw_mode as test_gw_mode
 import neutron.tests.unit.test_extension_security_group as sg
 import neutron.tests.unit.test_l3_plugin as test_l3_plugin
+from neutron_lbaas.db.loadbalancer import loadbalancer_db
 from oslo_config import cfg
 
 
@@ -133,3 +145,342 @@ class TestExtGwMode(MidonetPluginV2TestCase,
     def setUp(self):
         self.skipTest("It fails because of constraints")
     pass
+
+
+class MidonetMixinTestCase(base.BaseTestCase):
+    """Test the MidonetMixin methods with the Neutron DB methods mocked."""
+
+    def setUp(self):
+        super(MidonetMixinTestCase, self).setUp()
+        self.plugin = plugin.MidonetMixin.__new__(plugin.MidonetMixin)
+        self.plugin.api_cli = mock.Mock()
+        self.plugin.api_breaker = circuit_breaker.CircuitBreaker(0, 0)
+        self.plugin.journal_only = False
+        self.plugin.dispatcher = None
+        self.plugin.suppressed_updates = collections.Counter()
+        self.plugin._default_sg_ids = {}
+        self.context = mock.MagicMock()
+        self.context.session.transaction = None
+        self.create_task = self._patch(task, 'create_task')
+        self.addCleanup(mock.patch.stopall)
+
+    def _patch(self, target, name, **kwargs):
+        return mock.patch.object(target, name, **kwargs).start()
+
+    def _use_async_dispatch(self):
+        self.plugin.dispatcher = dispatcher.ApiDispatcher(4)
+        self.calls = []
+
+        def _record(name, delay=0):
+            def _call(*args):
+                eventlet.sleep(delay)
+                self.calls.append(name)
+            return _call
+
+        for method, delay in (('create_port', 0.01), ('create_pool', 0.01),
+                              ('add_router_interface', 0),
+                              ('create_member', 0)):
+            getattr(self.plugin.api_cli, method).side_effect = _record(
+                method, delay)
+
+    def _patch_router_interface(self):
+        self._patch(db_util, 'get_subnet',
+                    return_value=mock.Mock(network_id='net'))
+        self._patch(l3_gwmode_db.L3_NAT_db_mixin, 'add_router_interface',
+                    return_value={'id': 'router', 'port_id': 'port',
+                                  'subnet_id': 'subnet'})
+
+    def test_journal_mode_never_calls_api(self):
+        self.plugin.journal_only = True
+        self._patch_router_interface()
+        self._patch(plugin.MidonetMixin, '_get_tenant_id_for_create',
+                    return_value='tenant')
+        self._patch(plugin.MidonetMixin, '_ensure_default_security_group')
+        self._patch(self.plugin, '_create_network_db',
+                    return_value={'id': 'net'})
+
+        self.plugin.create_network(self.context, {'network': {}})
+        self.plugin.add_router_interface(self.context, 'router',
+                                         {'subnet_id': 'subnet'})
+
+        self.assertEqual([], self.plugin.api_cli.mock_calls)
+        self.assertEqual([task.NETWORK, task.ROUTER_INTERFACE],
+                         [c[1]['data_type']
+                          for c in self.create_task.call_args_list])
+
+    def test_router_interface_not_journaled_in_sync_mode(self):
+        self._patch_router_interface()
+
+        self.plugin.add_router_interface(self.context, 'router',
+                                         {'subnet_id': 'subnet'})
+
+        self.assertFalse(self.create_task.called)
+        self.assertTrue(self.plugin.api_cli.add_router_interface.called)
+
+    def test_default_security_group_cached(self):
+        ensure = self._patch(plugin.MidonetMixin,
+                             '_ensure_default_security_group',
+                             return_value='sg')
+
+        ensure_cached = self.plugin._ensure_default_security_group_cached
+        for i in range(2):
+            self.assertEqual('sg', ensure_cached(self.context, 'tenant'))
+
+        ensure.assert_called_once_with(self.context, 'tenant')
+
+    def test_default_security_group_cached_after_commit(self):
+        self._patch(plugin.MidonetMixin, '_ensure_default_security_group',
+                    return_value='sg')
+        cache_after_commit = self._patch(db_util, 'cache_after_commit')
+
+        self.plugin._ensure_default_security_group_cached(self.context,
+                                                          'tenant')
+
+        cache_after_commit.assert_called_once_with(
+            self.context.session, self.plugin._default_sg_ids, 'tenant',
+            'sg')
+
+    def test_delete_default_security_group_invalidates_cache(self):
+        self.plugin._default_sg_ids['tenant'] = 'sg'
+        self._patch(securitygroups_db.SecurityGroupDbMixin,
+                    'get_security_group',
+                    return_value={'id': 'sg', 'name': 'default',
+                                  'tenant_id': 'tenant'})
+        self._patch(securitygroups_db.SecurityGroupDbMixin,
+                    'delete_security_group')
+
+        self.plugin.delete_security_group(self.context, 'sg')
+
+        self.assertEqual({}, self.plugin._default_sg_ids)
+
+    def _patch_port_bulk(self, ports):
+        self._patch(plugin.lock, 'lock_all')
+        self._patch(self.plugin, '_create_port_db', side_effect=ports)
+        return self._patch(db_base_plugin_v2.NeutronDbPluginV2,
+                           'delete_port')
+
+    def test_create_port_bulk_creates_each_port(self):
+        ports = [{'id': 'port%d' % i, 'network_id': 'net'} for i in range(2)]
+        self._patch_port_bulk(ports)
+
+        self.plugin.create_port_bulk(
+            self.context, {'ports': [{'port': {'network_id': 'net'}}] * 2})
+
+        self.assertEqual([mock.call(p) for p in ports],
+                         self.plugin.api_cli.create_port.call_args_list)
+
+    def test_create_port_bulk_failure_rolls_back_all_ports(self):
+        ports = [{'id': 'port%d' % i, 'network_id': 'net'} for i in range(3)]
+        delete_port = self._patch_port_bulk(ports)
+        self.plugin.api_cli.create_port.side_effect = [None, ValueError()]
+
+        self.assertRaises(
+            ValueError, self.plugin.create_port_bulk, self.context,
+            {'ports': [{'port': {'network_id': 'net'}}] * 3})
+
+        self.plugin.api_cli.delete_port.assert_called_once_with('port0')
+        self.assertEqual([mock.call(self.context, p['id']) for p in ports],
+                         delete_port.call_args_list)
+
+    def test_async_create_port_bulk_failure_rolls_back_all_ports(self):
+        self.plugin.dispatcher = dispatcher.ApiDispatcher(4)
+        ports = [{'id': 'port%d' % i, 'network_id': 'net%d' % i}
+                 for i in range(3)]
+        delete_port = self._patch_port_bulk(ports)
+        self._patch(plugin.n_context, 'get_admin_context',
+                    return_value=self.context)
+        self.plugin.api_cli.create_port.side_effect = [None, ValueError()]
+
+        self.plugin.create_port_bulk(
+            self.context, {'ports': [{'port': {'network_id': p[
+                'network_id']}} for p in ports]})
+        self.plugin.dispatcher.waitall()
+
+        self.plugin.api_cli.delete_port.assert_called_once_with('port0')
+        self.assertEqual([mock.call(self.context, p['id']) for p in ports],
+                         delete_port.call_args_list)
+
+    def test_create_network_bulk_failure_rolls_back_all_networks(self):
+        nets = [{'id': 'net%d' % i} for i in range(3)]
+        self._patch(plugin.MidonetMixin, '_get_tenant_id_for_create',
+                    return_value='tenant')
+        self._patch(self.plugin, '_ensure_default_security_group_cached')
+        self._patch(self.plugin, '_create_network_db', side_effect=nets)
+        delete_network = self._patch(db_base_plugin_v2.NeutronDbPluginV2,
+                                     'delete_network')
+        self.plugin.api_cli.create_network.side_effect = [None, None,
+                                                          ValueError()]
+
+        self.assertRaises(ValueError, self.plugin.create_network_bulk,
+                          self.context, {'networks': [{'network': {}}] * 3})
+
+        self.assertEqual([mock.call('net1'), mock.call('net0')],
+                         self.plugin.api_cli.delete_network.call_args_list)
+        self.assertEqual([mock.call(self.context, n['id']) for n in nets],
+                         delete_network.call_args_list)
+
+    def test_create_subnet_bulk_failure_rolls_back_all_subnets(self):
+        subnets = [{'id': 'subnet%d' % i, 'network_id': 'net'}
+                   for i in range(2)]
+        self._patch(self.plugin, '_create_subnet_db', side_effect=subnets)
+        delete_subnet = self._patch(db_base_plugin_v2.NeutronDbPluginV2,
+                                    'delete_subnet')
+        self.plugin.api_cli.create_subnet.side_effect = ValueError()
+
+        self.assertRaises(ValueError, self.plugin.create_subnet_bulk,
+                          self.context, {'subnets': [{'subnet': {}}] * 2})
+
+        self.assertFalse(self.plugin.api_cli.delete_subnet.called)
+        self.assertEqual([mock.call(self.context, s['id']) for s in subnets],
+                         delete_subnet.call_args_list)
+
+    def test_create_security_group_rule_bulk_uses_bulk_api(self):
+        rules = [{'id': 'rule%d' % i, 'security_group_id': 'sg'}
+                 for i in range(2)]
+        self._patch(securitygroups_db.SecurityGroupDbMixin,
+                    'create_security_group_rule_bulk_native',
+                    return_value=rules)
+
+        self.plugin.create_security_group_rule_bulk(
+            self.context, {'security_group_rules': []})
+
+        api_cli = self.plugin.api_cli
+        api_cli.create_security_group_rule_bulk.assert_called_once_with(rules)
+        self.assertFalse(api_cli.create_security_group_rule.called)
+
+    def _patch_port_sg_update(self, bound_ids):
+        self._patch(plugin.MidonetMixin, '_check_update_has_security_groups',
+                    return_value=True)
+        self._patch(plugin.MidonetMixin,
+                    '_check_update_deletes_security_groups',
+                    return_value=False)
+        self._patch(plugin.MidonetMixin, '_get_security_groups_on_port',
+                    side_effect=lambda context, port: set(
+                        port['port']['security_groups']))
+        create_binding = self._patch(plugin.MidonetMixin,
+                                     '_create_port_security_group_binding')
+        bindings = self.context.session.query.return_value.filter_by(
+            port_id='port')
+        bindings.with_entities.return_value = [
+            mock.Mock(security_group_id=sg_id) for sg_id in bound_ids]
+        return bindings, create_binding
+
+    def test_unchanged_port_security_groups_touch_no_bindings(self):
+        bindings, create_binding = self._patch_port_sg_update(['sg2', 'sg1'])
+        out_port = {}
+
+        self.plugin._process_port_update(
+            self.context, 'port', {'port': {'security_groups': ['sg1',
+                                                                'sg2']}},
+            out_port)
+
+        self.assertFalse(bindings.filter.called)
+        self.assertFalse(create_binding.called)
+        self.assertEqual(['sg1', 'sg2'],
+                         sorted(out_port[ext_sg.SECURITYGROUPS]))
+        self.assertIsInstance(out_port[ext_sg.SECURITYGROUPS], list)
+
+    def test_changed_port_security_groups_update_bindings(self):
+        bindings, create_binding = self._patch_port_sg_update(['sg1', 'sg3'])
+
+        self.plugin._process_port_update(
+            self.context, 'port', {'port': {'security_groups': ['sg1',
+                                                                'sg2']}},
+            {})
+
+        bindings.filter.return_value.delete.assert_called_once_with(
+            synchronize_session=False)
+        create_binding.assert_called_once_with(self.context, 'port', 'sg2')
+
+    def _patch_port_update(self, original, updated):
+        self._patch(plugin.MidonetMixin, 'get_port', return_value=original)
+        self._patch(db_base_plugin_v2.NeutronDbPluginV2, 'update_port',
+                    return_value=updated)
+        self._patch(self.plugin, '_process_port_update')
+        self._patch(plugin.MidonetMixin,
+                    '_process_portbindings_create_and_update')
+
+    def test_noop_port_update_is_suppressed(self):
+        port = {'id': 'port', 'network_id': 'net', 'name': 'foo',
+                'security_groups': ['sg1', 'sg2']}
+        self._patch_port_update(port, dict(port,
+                                           security_groups=['sg2', 'sg1']))
+
+        self.plugin.update_port(self.context, 'port', {'port': {}})
+
+        self.assertFalse(self.create_task.called)
+        self.assertFalse(self.plugin.api_cli.update_port.called)
+        self.assertEqual({'port': 1}, self.plugin.suppressed_updates)
+
+    def test_port_update_is_dispatched(self):
+        port = {'id': 'port', 'network_id': 'net', 'name': 'foo'}
+        self._patch_port_update(port, dict(port, name='bar'))
+
+        self.plugin.update_port(self.context, 'port', {'port': {}})
+
+        self.assertTrue(self.create_task.called)
+        self.plugin.api_cli.update_port.assert_called_once_with(
+            'port', dict(port, name='bar'))
+        self.assertEqual({}, self.plugin.suppressed_updates)
+
+    def _patch_network_update(self, original, updated):
+        self._patch(plugin.MidonetMixin, 'get_network',
+                    return_value=original)
+        self._patch(db_base_plugin_v2.NeutronDbPluginV2, 'update_network',
+                    return_value=updated)
+        self._patch(plugin.MidonetMixin, '_process_l3_update')
+
+    def test_noop_network_update_is_suppressed(self):
+        net = {'id': 'net', 'name': 'foo'}
+        self._patch_network_update(net, dict(net))
+
+        self.plugin.update_network(self.context, 'net', {'network': {}})
+
+        self.assertFalse(self.create_task.called)
+        self.assertFalse(self.plugin.api_cli.update_network.called)
+        self.assertEqual({'network': 1}, self.plugin.suppressed_updates)
+
+    def test_network_update_is_dispatched(self):
+        net = {'id': 'net', 'name': 'foo'}
+        self._patch_network_update(net, dict(net, name='bar'))
+
+        self.plugin.update_network(self.context, 'net', {'network': {}})
+
+        self.assertTrue(self.create_task.called)
+        self.plugin.api_cli.update_network.assert_called_once_with(
+            'net', dict(net, name='bar'))
+
+    def test_get_system_reports_suppressed_updates(self):
+        self._patch(plugin.MidonetMixin, '_fields',
+                    side_effect=lambda res, fields: res)
+        self.plugin.suppressed_updates['port'] += 2
+
+        system = self.plugin.get_system(self.context, 'system')
+
+        self.assertEqual({'port': 2}, system['suppressed_updates'])
+
+    def test_async_router_interface_follows_port_creation(self):
+        self._use_async_dispatch()
+        self._patch_router_interface()
+
+        self.plugin._dispatch(self.context, 'net', 'create_port',
+                              {'id': 'port', 'network_id': 'net'})
+        self.plugin.add_router_interface(self.context, 'router',
+                                         {'subnet_id': 'subnet'})
+        self.plugin.dispatcher.waitall()
+
+        self.assertEqual(['create_port', 'add_router_interface'],
+                         self.calls)
+
+    def test_async_member_follows_pool_creation(self):
+        self._use_async_dispatch()
+        self._patch(self.plugin, '_set_status')
+        self._patch(loadbalancer_db.LoadBalancerPluginDb, 'create_member',
+                    return_value={'id': 'member', 'pool_id': 'pool'})
+
+        self.plugin._dispatch(self.context, ('pool', 'router'),
+                              'create_pool', {'id': 'pool'})
+        self.plugin.create_member(self.context, {'member': {}})
+        self.plugin.dispatcher.waitall()
+
+        self.assertEqual(['create_pool', 'create_member'], self.calls)
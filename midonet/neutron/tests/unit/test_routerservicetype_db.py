@@ -0,0 +1,85 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron import context
+from neutron.db import common_db_mixin
+from neutron.db import l3_db
+from neutron.extensions import routerservicetype as rst
+from neutron.tests.unit import testlib_api
+
+from midonet.neutron.db import routerservicetype_db as rst_db
+
+
+class RouterServiceTypeTestPlugin(common_db_mixin.CommonDbMixin,
+                                  rst_db.RouterServiceTypeDbMixin):
+    pass
+
+
+class RouterServiceTypeDbTestCase(testlib_api.SqlTestCase):
+    """Test for midonet.neutron.db.routerservicetype_db."""
+
+    def setUp(self):
+        super(RouterServiceTypeDbTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.plugin = RouterServiceTypeTestPlugin()
+        with self.ctx.session.begin():
+            for router_id in ('r1', 'r2', 'r3'):
+                self.ctx.session.add(l3_db.Router(
+                    id=router_id, tenant_id='tenant', name=router_id,
+                    status='ACTIVE', admin_state_up=True))
+            self.ctx.session.add(rst_db.RouterServiceTypeBinding(
+                router_id='r1', service_type_id='st1'))
+            self.ctx.session.add(rst_db.RouterServiceTypeBinding(
+                router_id='r3', service_type_id='st3'))
+
+    def _extend(self):
+        routers = [{'id': 'r1'}, {'id': 'r2'}, {'id': 'r3'}]
+        return self.plugin._extend_router_service_type_id_dicts(self.ctx,
+                                                                routers)
+
+    def test_extend_router_service_type_id_dicts(self):
+        self.assertEqual([{'id': 'r1', rst.SERVICE_TYPE_ID: 'st1'},
+                          {'id': 'r2'},
+                          {'id': 'r3', rst.SERVICE_TYPE_ID: 'st3'}],
+                         self._extend())
+
+    def test_extend_router_service_type_id_dicts_in_batches(self):
+        with mock.patch.object(rst_db, 'BINDING_QUERY_BATCH_SIZE', 2):
+            with mock.patch.object(self.plugin, '_model_query',
+                                   wraps=self.plugin._model_query) as query:
+                routers = self._extend()
+        self.assertEqual(2, query.call_count)
+        self.assertEqual(['st1', None, 'st3'],
+                         [r.get(rst.SERVICE_TYPE_ID) for r in routers])
+
+    def test_router_query_loads_binding(self):
+        self.ctx.session.expunge_all()
+        routers = self.plugin._model_query(self.ctx, l3_db.Router).all()
+        self.assertTrue(all('service_type_binding' in r.__dict__
+                            for r in routers))
+        bindings = dict((r.id, r.service_type_binding) for r in routers)
+        self.assertEqual('st1', bindings['r1'].service_type_id)
+        self.assertIsNone(bindings['r2'])
+
+    def test_delete_router_deletes_binding(self):
+        with self.ctx.session.begin():
+            router = self.plugin._model_query(self.ctx, l3_db.Router).filter(
+                l3_db.Router.id == 'r1').one()
+            self.ctx.session.delete(router)
+        bindings = self.ctx.session.query(
+            rst_db.RouterServiceTypeBinding.router_id)
+        self.assertEqual(['r3'], sorted(b.router_id for b in bindings))
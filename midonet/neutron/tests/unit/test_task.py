@@ -0,0 +1,295 @@
+# Copyright (C) 2015 Midokura SARL.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from oslo_config import cfg
+
+from neutron import context
+from neutron.openstack.common import uuidutils
+from neutron.tests.unit import testlib_api
+
+from midonet.neutron.db import task
+
+_uuid = uuidutils.generate_uuid
+
+
+class TaskTestCase(testlib_api.SqlTestCase):
+    """Test for midonet.neutron.db.task."""
+
+    def setUp(self):
+        super(TaskTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+
+    def _create_tasks(self, count, type=task.CREATE, data_type=task.NETWORK,
+                      resource_id=None):
+        for i in range(count):
+            rid = resource_id or _uuid()
+            task.create_task(self.ctx, type, data_type=data_type,
+                             resource_id=rid, data={'id': rid, 'rev': i})
+
+    def _task_ids(self):
+        return [t.id for t in self.ctx.session.query(task.Task).order_by(
+            task.Task.id)]
+
+    def test_purge_tasks_by_id(self):
+        self._create_tasks(5)
+        ids = self._task_ids()
+
+        deleted = task.purge_tasks(self.ctx.session, ids[2], batch_size=2)
+
+        self.assertEqual(3, deleted)
+        self.assertEqual(ids[3:], self._task_ids())
+
+    def test_purge_tasks_by_age_within_id_bound(self):
+        self._create_tasks(4)
+        ids = self._task_ids()
+        old = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+        self.ctx.session.query(task.Task).filter(
+            task.Task.id.in_([ids[0], ids[3]])).update(
+            {'created_at': old}, synchronize_session=False)
+
+        deleted = task.purge_tasks(
+            self.ctx.session, ids[2],
+            created_before=datetime.datetime.utcnow() -
+            datetime.timedelta(days=1))
+
+        # The old task past max_task_id may not have been consumed yet.
+        self.assertEqual(1, deleted)
+        self.assertEqual(ids[1:], self._task_ids())
+
+    def test_purge_tasks_requires_max_task_id(self):
+        self.assertRaises(ValueError, task.purge_tasks, self.ctx.session,
+                          None, created_before=datetime.datetime.utcnow())
+
+    def _task_types(self, resource_id):
+        return [t.type for t in self.ctx.session.query(task.Task).filter(
+            task.Task.resource_id == resource_id).order_by(task.Task.id)]
+
+    def test_compact_tasks_keeps_create_and_last_update(self):
+        rid = _uuid()
+        self._create_tasks(1, resource_id=rid)
+        self._create_tasks(3, type=task.UPDATE, resource_id=rid)
+        last_id = self._task_ids()[-1]
+
+        deleted = task.compact_tasks(self.ctx.session, last_id)
+
+        self.assertEqual(2, deleted)
+        self.assertEqual([task.CREATE, task.UPDATE], self._task_types(rid))
+        self.assertIn(last_id, self._task_ids())
+
+    def test_compact_tasks_deleted_resource(self):
+        rid = _uuid()
+        self._create_tasks(1, resource_id=rid)
+        self._create_tasks(2, type=task.UPDATE, resource_id=rid)
+        self._create_tasks(1, type=task.DELETE, resource_id=rid)
+
+        task.compact_tasks(self.ctx.session, self._task_ids()[-1])
+
+        self.assertEqual([task.CREATE, task.DELETE], self._task_types(rid))
+
+    def test_compact_tasks_deleted_leaf_resource(self):
+        rid = _uuid()
+        for type in (task.CREATE, task.UPDATE, task.DELETE):
+            self._create_tasks(1, type=type, data_type=task.FLOATING_IP,
+                               resource_id=rid)
+
+        task.compact_tasks(self.ctx.session, self._task_ids()[-1])
+
+        self.assertEqual([], self._task_types(rid))
+
+    def test_compact_tasks_above_max_task_id(self):
+        rid = _uuid()
+        self._create_tasks(1, resource_id=rid)
+        self._create_tasks(3, type=task.UPDATE, resource_id=rid)
+        ids = self._task_ids()
+
+        task.compact_tasks(self.ctx.session, ids[1])
+
+        self.assertEqual(ids, self._task_ids())
+
+    def test_replay_concurrent_tasks(self):
+        self._create_tasks(2)
+        cut_task_id = self._task_ids()[-1]
+        rid = _uuid()
+        other_ctx = context.get_admin_context()
+        task.create_task(other_ctx, task.CREATE, data_type=task.NETWORK,
+                         resource_id=rid, data={'id': rid})
+        original_id = self._task_ids()[-1]
+
+        task.MidoClusterMixin()._replay_concurrent_tasks(
+            self.ctx, cut_task_id, cut_task_id + 1)
+
+        # The task is moved, so that its CREATE is not seen twice.
+        self.assertEqual([task.CREATE], self._task_types(rid))
+        self.assertEqual(3, len(self._task_ids()))
+        self.assertGreater(self._last_task(rid).id, original_id)
+
+    def test_replay_concurrent_delta_tasks(self):
+        self._set_delta_encoding()
+        rid = _uuid()
+        other_ctx = context.get_admin_context()
+        task.create_task(other_ctx, task.CREATE, data_type=task.PORT,
+                         resource_id=rid, data={'id': rid, 'rev': 0})
+        cut_task_id = self._task_ids()[-1]
+        for i in range(1, 3):
+            task.create_task(other_ctx, task.UPDATE, data_type=task.PORT,
+                             resource_id=rid, data={'id': rid, 'rev': i})
+
+        task.MidoClusterMixin()._replay_concurrent_tasks(
+            self.ctx, cut_task_id, cut_task_id + 1)
+
+        replayed = self.ctx.session.query(task.Task).filter(
+            task.Task.id > cut_task_id).order_by(task.Task.id).all()
+        self.assertEqual([False, False],
+                         [task.is_delta_task_data(t.data) for t in replayed])
+        self.assertEqual([{'id': rid, 'rev': 1}, {'id': rid, 'rev': 2}],
+                         [task.decode_task_data(t.data) for t in replayed])
+
+    def test_lowest_in_flight_task_id(self):
+        mixin = task.MidoClusterMixin()
+        self.assertEqual(0, mixin._lowest_in_flight_task_id(self.ctx))
+
+        self._create_tasks(5)
+        ids = self._task_ids()
+        self.ctx.session.query(task.Task).filter(
+            task.Task.id == ids[2]).delete(synchronize_session=False)
+
+        # The gap left by the deleted task is not in flight.
+        self.assertEqual(ids[-1] + 1,
+                         mixin._lowest_in_flight_task_id(self.ctx))
+
+    def test_replay_concurrent_tasks_from_lowest_in_flight(self):
+        self._create_tasks(5)
+        ids = self._task_ids()
+        self.ctx.session.query(task.Task).filter(
+            task.Task.id == ids[1]).delete(synchronize_session=False)
+
+        # The tasks between the cut and the lowest task in flight were
+        # committed before the snapshot, so they are not replayed.
+        import_ctx = context.get_admin_context()
+        task.MidoClusterMixin()._replay_concurrent_tasks(import_ctx, ids[0],
+                                                         ids[3])
+
+        remaining = self._task_ids()
+        self.assertEqual([ids[0], ids[2]], remaining[:2])
+        self.assertEqual(4, len(remaining))
+        self.assertGreater(remaining[2], ids[-1])
+
+    def test_create_tasks(self):
+        items = [{'id': _uuid()} for i in range(3)]
+
+        task.create_tasks(self.ctx, task.CREATE, task.PORT, items)
+
+        tasks = self.ctx.session.query(task.Task).order_by(task.Task.id)
+        self.assertEqual([i['id'] for i in items],
+                         [t.resource_id for t in tasks])
+        for t in tasks:
+            self.assertEqual(task.PORT, t.data_type)
+            self.assertEqual(self.ctx.request_id, t.transaction_id)
+
+    def _set_compression(self, enabled):
+        cfg.CONF.set_override('task_data_compression', enabled, 'MIDONET')
+        self.addCleanup(cfg.CONF.clear_override, 'task_data_compression',
+                        'MIDONET')
+
+    def test_task_data_compressed(self):
+        self._set_compression(True)
+        data = {'id': _uuid(), 'name': 'x' * 100}
+
+        encoded = task.encode_task_data(data)
+
+        self.assertTrue(encoded.startswith(task.ZLIB_MARKER))
+        self.assertEqual(data, task.decode_task_data(encoded))
+
+    def test_task_data_uncompressed(self):
+        self._set_compression(False)
+        data = {'id': _uuid()}
+
+        encoded = task.encode_task_data(data)
+
+        self.assertFalse(encoded.startswith(task.ZLIB_MARKER))
+        self.assertEqual(data, task.decode_task_data(encoded))
+
+    def test_task_data_text(self):
+        data = {'id': _uuid()}
+
+        self.assertEqual(data, task.decode_task_data(
+            u'{"id": "%s"}' % data['id']))
+
+    def _set_delta_encoding(self, interval=10):
+        cfg.CONF.set_override('task_update_encoding', 'delta', 'MIDONET')
+        cfg.CONF.set_override('task_full_update_interval', interval,
+                              'MIDONET')
+        self.addCleanup(cfg.CONF.clear_override, 'task_update_encoding',
+                        'MIDONET')
+        self.addCleanup(cfg.CONF.clear_override, 'task_full_update_interval',
+                        'MIDONET')
+
+    def _update(self, rid, data):
+        task.create_task(self.ctx, task.UPDATE, data_type=task.PORT,
+                         resource_id=rid, data=data)
+
+    def _last_task(self, rid):
+        return self.ctx.session.query(task.Task).filter(
+            task.Task.resource_id == rid).order_by(
+            task.Task.id.desc()).first()
+
+    def test_delta_update(self):
+        self._set_delta_encoding()
+        rid = _uuid()
+        port = {'id': rid, 'name': 'foo', 'admin_state_up': True}
+        task.create_task(self.ctx, task.CREATE, data_type=task.PORT,
+                         resource_id=rid, data=port)
+
+        self._update(rid, dict(port, name='bar'))
+
+        raw = self._last_task(rid).data
+        self.assertTrue(task.is_delta_task_data(raw))
+        self.assertEqual({'changed': {'name': 'bar'}, 'removed': []},
+                         task.decode_task_data(raw))
+        self.assertEqual((dict(port, name='bar'), 1),
+                         task.get_resource_state(self.ctx.session, task.PORT,
+                                                 rid))
+
+    def test_delta_update_full_interval(self):
+        self._set_delta_encoding(interval=3)
+        rid = _uuid()
+        task.create_task(self.ctx, task.CREATE, data_type=task.PORT,
+                         resource_id=rid, data={'id': rid, 'rev': 0})
+
+        deltas = []
+        for i in range(1, 6):
+            self._update(rid, {'id': rid, 'rev': i})
+            deltas.append(task.is_delta_task_data(self._last_task(rid).data))
+
+        self.assertEqual([True, True, False, True, True], deltas)
+        self.assertEqual(({'id': rid, 'rev': 5}, 2),
+                         task.get_resource_state(self.ctx.session, task.PORT,
+                                                 rid))
+
+    def test_compact_tasks_expands_delta(self):
+        self._set_delta_encoding()
+        rid = _uuid()
+        task.create_task(self.ctx, task.CREATE, data_type=task.PORT,
+                         resource_id=rid, data={'id': rid, 'rev': 0})
+        for i in range(1, 4):
+            self._update(rid, {'id': rid, 'rev': i})
+
+        task.compact_tasks(self.ctx.session, self._task_ids()[-1])
+
+        raw = self._last_task(rid).data
+        self.assertFalse(task.is_delta_task_data(raw))
+        self.assertEqual({'id': rid, 'rev': 3}, task.decode_task_data(raw))
@@ -15,7 +15,9 @@
 #    under the License.
 
 import abc
+import mock
 
+from oslo_db import exception as db_exc
 import six
 
 from neutron.api.v2 import base as api_base
@@ -183,3 +185,75 @@ class UtilTestCase(base.BaseTestCase):
             pass
 
         self.assertEqual(retry_num, test_obj.attempt)
+
+    def test_synchronized_on(self):
+
+        class TestClass(object):
+
+            @util.synchronized_on('foo-lock', lambda self, key: key)
+            def test(self, key):
+                return key
+
+        with mock.patch.object(util.lock, 'get_driver') as get_driver:
+            self.assertEqual('bar', TestClass().test('bar'))
+
+        get_driver.return_value.lock.assert_called_once_with('foo-lock-bar')
+
+    def _retry_test_class(self, error, **kwargs):
+
+        class TestClass(object):
+
+            def __init__(self):
+                self.attempt = 0
+
+            @util.retry_on_db_conflict(**kwargs)
+            def retried(self):
+                self.attempt += 1
+                raise error
+
+        return TestClass()
+
+    def test_retry_on_db_conflict_deadlock(self):
+        test_obj = self._retry_test_class(db_exc.DBDeadlock(), max_retries=2)
+
+        with mock.patch.object(util.time, 'sleep') as sleep:
+            self.assertRaises(db_exc.DBDeadlock, test_obj.retried)
+
+        self.assertEqual(3, test_obj.attempt)
+        self.assertEqual(2, sleep.call_count)
+        for (delay,), _kwargs in sleep.call_args_list:
+            self.assertTrue(0 <= delay <= 1.0)
+
+    def test_retry_on_db_conflict_lock_wait_timeout(self):
+        error = db_exc.DBError(Exception(
+            '(OperationalError) (1205, Lock wait timeout exceeded; try '
+            'restarting transaction)'))
+        test_obj = self._retry_test_class(error, max_retries=1)
+
+        with mock.patch.object(util.time, 'sleep'):
+            self.assertRaises(db_exc.DBError, test_obj.retried)
+
+        self.assertEqual(2, test_obj.attempt)
+
+    def test_retry_on_db_conflict_other_error(self):
+        test_obj = self._retry_test_class(db_exc.DBError(ValueError()))
+
+        with mock.patch.object(util.time, 'sleep') as sleep:
+            self.assertRaises(db_exc.DBError, test_obj.retried)
+
+        self.assertEqual(1, test_obj.attempt)
+        self.assertFalse(sleep.called)
+
+    def test_retry_on_db_conflict_budget(self):
+        test_obj = self._retry_test_class(db_exc.DBDeadlock(), max_retries=5,
+                                          initial_delay=1.0, budget=0.0)
+        retries = util.RETRY_COUNTS['retried']
+        give_ups = util.GIVE_UP_COUNTS['retried']
+
+        with mock.patch.object(util.time, 'sleep'):
+            with mock.patch.object(util.random, 'uniform', return_value=0.5):
+                self.assertRaises(db_exc.DBDeadlock, test_obj.retried)
+
+        self.assertEqual(1, test_obj.attempt)
+        self.assertEqual(retries, util.RETRY_COUNTS['retried'])
+        self.assertEqual(give_ups + 1, util.GIVE_UP_COUNTS['retried'])